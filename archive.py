@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from db import DBHelper
+from tasks import TASK_COLUMNS
+
+class TaskArchiver:
+    """Moves completed tasks older than a threshold from `tasks` into `tasks_archive`.
+
+    Work is done in small transactions so request threads only ever wait for one batch.
+    """
+
+    def __init__(self, db: DBHelper, after_days=30, batch_size=500, interval_minutes=60, bus=None):
+        self.db = db
+        self.bus = bus
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval_minutes * 60
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def archive_batch(self, cutoff):
+        with self.db.transaction():
+            c = self.db.execute(
+                "SELECT id FROM tasks WHERE status = 'done' AND completed_at < ? ORDER BY completed_at LIMIT ?",
+                (cutoff, self.batch_size),
+            )
+            ids = [r[0] for r in c.fetchall()]
+            if not ids:
+                return 0
+            marks = ",".join("?" * len(ids))
+            self.db.execute(
+                f"INSERT OR REPLACE INTO tasks_archive ({TASK_COLUMNS}, archived_at) "
+                f"SELECT {TASK_COLUMNS}, ? FROM tasks WHERE id IN ({marks})",
+                (int(time.time()), *ids),
+            )
+            self.db.execute(f"DELETE FROM tasks WHERE id IN ({marks})", tuple(ids))
+            if self.bus:
+                for task_id in ids:
+                    self.bus.publish("task", "delete", task_id)
+        return len(ids)
+
+    def run_once(self):
+        cutoff = int(time.time()) - self.after_days * 86400
+        total = 0
+        while True:
+            moved = self.archive_batch(cutoff)
+            total += moved
+            if moved < self.batch_size:
+                break
+        if total:
+            logging.info(f"Archived {total} completed tasks")
+        return total
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Task archival failed: {e}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="task-archiver", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,139 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from starlette.concurrency import run_in_threadpool
+from db import DBHelper
+
+CHUNK_SIZE = 256 * 1024
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+ATTACHMENT_FIELDS = ("hash", "filename", "content_type", "size", "created_at")
+
+class AttachmentTooLargeError(ValueError):
+    pass
+
+def parse_byte_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, None to send the whole file,
+    or ValueError if the range cannot be satisfied."""
+    m = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:
+        start, end = max(size - int(m.group(2)), 0), size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+class AttachmentStore:
+    """Files attached to notes and tasks, stored once on disk under their SHA-256.
+
+    Blobs live at <root>/<h[:2]>/<h[2:4]>/<h>; attachments has one row per blob and
+    attachment_links ties blobs to notes/tasks, so the same file attached twice is stored once.
+    Blobs without links are removed by collect_garbage().
+    """
+
+    def __init__(self, db: DBHelper, dir="attachments", max_mb=100):
+        self.db = db
+        self.root = os.path.abspath(dir)
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def path_of(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    async def save_stream(self, chunks):
+        """Write an async byte stream to a temp file while hashing it; disk writes run in the threadpool.
+        Returns (tmp_path, hash, size) for attach()."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        sha, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                def write(chunk):
+                    sha.update(chunk)
+                    f.write(chunk)
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise AttachmentTooLargeError(f"Attachment exceeds {self.max_bytes} bytes")
+                    await run_in_threadpool(write, chunk)
+            return tmp_path, sha.hexdigest(), size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def attach(self, kind, ref_id, tmp_path, digest, size, filename, content_type):
+        """Move an uploaded temp file into place and link it. The blob check and the inserts share one
+        transaction, so collect_garbage cannot remove the blob in between."""
+        now = int(time.time())
+        try:
+            with self.db.transaction():
+                path = self.path_of(digest)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                self.db.execute(
+                    "INSERT OR IGNORE INTO attachments (hash, size, content_type, created_at) VALUES (?, ?, ?, ?)",
+                    (digest, size, content_type, now),
+                )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO attachment_links (kind, ref_id, hash, filename, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (kind, ref_id, digest, filename, now),
+                )
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def get(self, digest):
+        c = self.db.execute("SELECT hash, size, content_type FROM attachments WHERE hash=?", (digest,))
+        row = c.fetchone() if c else None
+        return dict(zip(("hash", "size", "content_type"), row)) if row else None
+
+    def list_for(self, kind, ref_id):
+        c = self.db.execute(
+            "SELECT l.hash, l.filename, a.content_type, a.size, l.created_at FROM attachment_links l "
+            "JOIN attachments a ON a.hash = l.hash WHERE l.kind=? AND l.ref_id=? ORDER BY l.created_at",
+            (kind, ref_id),
+        )
+        return [dict(zip(ATTACHMENT_FIELDS, r)) for r in (c.fetchall() if c else [])]
+
+    def detach(self, kind, ref_id, digest):
+        c = self.db.execute(
+            "DELETE FROM attachment_links WHERE kind=? AND ref_id=? AND hash=?", (kind, ref_id, digest), commit=True
+        )
+        if c and c.rowcount:
+            self.collect_garbage()
+            return True
+        return False
+
+    def collect_garbage(self):
+        """Drop blobs no note or task links to any more. Returns how many were removed."""
+        # Files are unlinked while the transaction (and so the DB lock) is held; attach() checks for the
+        # blob under the same lock, so it never links a file that is about to disappear.
+        with self.db.transaction():
+            c = self.db.execute("SELECT hash FROM attachments WHERE hash NOT IN (SELECT hash FROM attachment_links)")
+            orphans = [r[0] for r in c.fetchall()]
+            for digest in orphans:
+                self.db.execute("DELETE FROM attachments WHERE hash=?", (digest,))
+                try:
+                    os.unlink(self.path_of(digest))
+                except FileNotFoundError:
+                    pass
+        return len(orphans)
+
+    def read_range(self, digest, start, end):
+        """Yield bytes start..end (inclusive) of a blob from a memory map, CHUNK_SIZE at a time."""
+        with open(self.path_of(digest), "rb") as f:
+            if end < start:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                while pos <= end:
+                    stop = min(pos + CHUNK_SIZE, end + 1)
+                    yield mm[pos:stop]
+                    pos = stop
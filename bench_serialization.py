@@ -0,0 +1,58 @@
+"""Per-row JSON serialization cost of /tasks and /weather/history, before and after the fast path.
+
+"before" is what FastAPI did for these routes without a response model: jsonable_encoder over
+the raw sqlite rows, then stdlib json. "after" is the response model validating the rows and
+rendering through the app's default response class (orjson if installed, else pydantic's own
+JSON serializer).
+
+    python bench_serialization.py [rows ...]
+"""
+import json
+import sys
+import time
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from serialization import FastJSONResponse, TaskListResponse, WeatherHistoryResponse, orjson
+
+def task_rows(n):
+    return [(i, f"Task {i}", "Pick up the parcel from the post office", "2026-10-20", i % 5 + 1,
+             1792454400 + i * 60, "open" if i % 3 else "done", None if i % 3 else 1792454400, 1) for i in range(n)]
+
+def weather_rows(n):
+    return [{"id": i, "city": "Bengaluru", "date": "2026-10-20", "weather": "Clouds, 24.5°C", "checked_at": 1792454400 + i}
+            for i in range(n)]
+
+def before(content):
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def after(adapter):
+    if orjson is not None:
+        return lambda content: FastJSONResponse(adapter.dump_python(adapter.validate_python(content), mode="json")).body
+    return lambda content: adapter.dump_json(adapter.validate_python(content))
+
+def per_row_us(fn, content, rows, repeat=5):
+    fn(content)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best / rows * 1e6
+
+def main(sizes):
+    print(f"renderer: {'orjson' if orjson is not None else 'pydantic dump_json'}")
+    print(f"{'endpoint':<18}{'rows':>8}{'before us/row':>16}{'after us/row':>15}{'speedup':>10}")
+    cases = [
+        ("/tasks", lambda n: {"tasks": task_rows(n)}, TypeAdapter(TaskListResponse)),
+        ("/weather/history", lambda n: {"history": weather_rows(n)}, TypeAdapter(WeatherHistoryResponse)),
+    ]
+    for name, make, adapter in cases:
+        fast = after(adapter)
+        for n in sizes:
+            content = make(n)
+            assert json.loads(before(content)) == json.loads(fast(content))
+            old, new = per_row_us(before, content, n), per_row_us(fast, content, n)
+            print(f"{name:<18}{n:>8}{old:>16.2f}{new:>15.2f}{old / new:>9.1f}x")
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 10000])
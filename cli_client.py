@@ -147,7 +147,7 @@ def show_weather_history():
 
 def add_reminder():
     content = input("Reminder content: ")
-    date = input("Date (YYYY-MM-DD): ")
+    date = input("Date (YYYY-MM-DD or YYYY-MM-DDTHH:MM): ")
     resp = requests.post(f"{BASE_URL}/reminders", json={"content": content, "date": date})
     print(resp.json().get("message", "Error"))
 
@@ -180,7 +180,7 @@ def show_todays_reminders():
 def edit_reminder():
     reminder_id = input("Reminder ID to edit: ")
     content = input("New content: ")
-    date = input("New date (YYYY-MM-DD): ")
+    date = input("New date (YYYY-MM-DD or YYYY-MM-DDTHH:MM): ")
     payload = {"content": content, "date": date}
     resp = requests.put(f"{BASE_URL}/reminders/{reminder_id}", json=payload)
     print(resp.json().get("message", "Error"))
@@ -0,0 +1,71 @@
+import datetime
+from db import DBHelper
+from utils import epoch_range
+
+class DashboardManager:
+    # Totals live in dashboard_counters and are maintained by the triggers installed in init_db;
+    # only the date-relative counts (overdue, today, this week) are read from the epoch indexes.
+    REBUILD_QUERIES = [
+        "SELECT 'tasks', COUNT(*) FROM tasks",
+        "SELECT 'tasks_priority_' || COALESCE(priority, 'none'), COUNT(*) FROM tasks GROUP BY priority",
+        "SELECT 'notes', COUNT(*) FROM notes",
+        "SELECT 'weather_checks', COUNT(*) FROM weather_history",
+        "SELECT 'weather_last_checked', MAX(checked_at) FROM weather_history",
+    ]
+
+    def __init__(self, db: DBHelper):
+        self.db = db
+
+    def get_counters(self):
+        c = self.db.execute("SELECT name, value FROM dashboard_counters")
+        return dict(c.fetchall()) if c else {}
+
+    def is_initialized(self):
+        c = self.db.execute("SELECT 1 FROM dashboard_counters LIMIT 1")
+        return bool(c and c.fetchone())
+
+    def _count_between(self, table, column, start, end):
+        c = self.db.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} >= ? AND {column} < ?", (start, end))
+        return c.fetchone()[0] if c else 0
+
+    def get_summary(self, today=None):
+        today = today or datetime.date.today()
+        counters = self.get_counters()
+        week_start = today - datetime.timedelta(days=today.weekday())
+        start_of_today, end_of_today = epoch_range(today.isoformat(), today.isoformat())
+        c = self.db.execute("SELECT COUNT(*) FROM tasks WHERE due_at < ? AND status = 'open'", (start_of_today,))
+        overdue = c.fetchone()[0] if c else 0
+        by_priority = {
+            name[len("tasks_priority_"):]: value
+            for name, value in sorted(counters.items())
+            if name.startswith("tasks_priority_") and value
+        }
+        return {
+            "tasks_total": counters.get("tasks", 0),
+            "tasks_overdue": overdue,
+            "tasks_by_priority": by_priority,
+            "reminders_today": self._count_between("reminders", "remind_at", start_of_today, end_of_today),
+            "reminders_this_week": self._count_between(
+                "reminders", "remind_at", *epoch_range(week_start.isoformat(), (week_start + datetime.timedelta(days=6)).isoformat())
+            ),
+            "notes_total": counters.get("notes", 0),
+            "weather_checks": counters.get("weather_checks", 0),
+            "last_weather_check": counters.get("weather_last_checked"),
+        }
+
+    def rebuild(self):
+        """Recompute every counter from the base tables; returns the counters that had drifted."""
+        with self.db.transaction():
+            before = self.get_counters()
+            rows = []
+            for q in self.REBUILD_QUERIES:
+                c = self.db.execute(q)
+                rows.extend(row for row in c.fetchall() if row[0] is not None and row[1] is not None)
+            self.db.execute("DELETE FROM dashboard_counters")
+            self.db.conn.executemany("INSERT INTO dashboard_counters (name, value) VALUES (?, ?)", rows)
+        after = dict(rows)
+        return {
+            name: {"stored": before.get(name), "actual": after.get(name)}
+            for name in set(before) | set(after)
+            if (before.get(name) or 0) != (after.get(name) or 0)
+        }
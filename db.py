@@ -1,28 +1,116 @@
+import datetime
 import sqlite3
 import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from utils import normalize_date, normalize_datetime, to_epoch, wall_clock_epoch
+
+class VersionConflictError(Exception):
+    def __init__(self, current_version):
+        super().__init__(f"Row was modified concurrently; current version is {current_version}")
+        self.current_version = current_version
+
+def zlib_decompress(value):
+    return zlib.decompress(value).decode("utf-8") if value is not None else None
 
 class DBHelper:
     def __init__(self, db_path):
         self.db_path = db_path
         self.conn = None
+        # One connection is shared by every request thread; the lock keeps a transaction's
+        # statements from interleaving with (and being committed by) another thread's writes.
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.pending = []
 
     def connect(self):
         try:
             self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Used by the notes_fts_source view to index compressed note bodies.
+            self.conn.create_function("zlib_decompress", 1, zlib_decompress, deterministic=True)
         except sqlite3.Error as e:
             logging.error(f"DB connection error: {e}")
         return self.conn
 
     def execute(self, query, params=(), commit=False):
-        try:
-            c = self.conn.cursor()
-            c.execute(query, params)
-            if commit:
-                self.conn.commit()
-            return c
-        except sqlite3.Error as e:
-            logging.error(f"DB query error: {e}")
-            return None
+        with self.lock:
+            try:
+                c = self.conn.cursor()
+                c.execute(query, params)
+                if commit and not self.depth:
+                    self.conn.commit()
+                return c
+            except sqlite3.Error as e:
+                logging.error(f"DB query error: {e}")
+                if self.depth:
+                    raise
+                return None
+
+    def update_changed(self, table, row_id, fields, expected_version=None):
+        """UPDATE only the given columns, and only if at least one actually differs; bumps the row version.
+
+        With expected_version the write is also conditional on the row still being at that version.
+        Returns the number of rows written (0 for a missing row, a stale version or a no-op), or None on error.
+        """
+        if not fields:
+            return 0
+        cols = list(fields)
+        assignments = ", ".join(f"{col}=?" for col in cols)
+        changed = " OR ".join(f"{col} IS NOT ?" for col in cols)
+        values = tuple(fields[col] for col in cols)
+        query = f"UPDATE {table} SET {assignments}, version = version + 1 WHERE id=? AND ({changed})"
+        params = values + (row_id,) + values
+        if expected_version is not None:
+            query += " AND version=?"
+            params += (expected_version,)
+        c = self.execute(query, params, commit=True)
+        return c.rowcount if c else None
+
+    def get_version(self, table, row_id):
+        c = self.execute(f"SELECT version FROM {table} WHERE id=?", (row_id,))
+        row = c.fetchone() if c else None
+        return row[0] if row else None
+
+    def check_version(self, table, row_id, expected_version):
+        """Current version of the row (None if missing); raises VersionConflictError if it is not the expected one."""
+        current = self.get_version(table, row_id)
+        if current is not None and expected_version is not None and current != expected_version:
+            raise VersionConflictError(current)
+        return current
+
+    def after_commit(self, callback):
+        """Run callback once the current transaction commits (dropped on rollback), or now if there is none."""
+        with self.lock:
+            if self.depth:
+                self.pending.append(callback)
+                return
+        callback()
+
+    @contextmanager
+    def transaction(self):
+        # Nested use joins the outer transaction; only the outermost block commits or rolls back.
+        # Inside a transaction execute() re-raises errors so the whole unit is undone.
+        with self.lock:
+            self.depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.depth -= 1
+                if not self.depth:
+                    self.conn.rollback()
+                    self.pending = []
+                raise
+            self.depth -= 1
+            if self.depth:
+                return
+            self.conn.commit()
+            callbacks, self.pending = self.pending, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"after_commit callback failed: {e}")
 
     def close(self):
         if self.conn:
@@ -37,20 +125,317 @@ def init_db(db_path):
             title TEXT,
             description TEXT,
             due_date TEXT,
-            priority INTEGER)''',
+            priority INTEGER,
+            due_at INTEGER,
+            status TEXT NOT NULL DEFAULT 'open',
+            completed_at INTEGER,
+            blocked_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 1)''',
+        '''CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            description TEXT,
+            due_date TEXT,
+            priority INTEGER,
+            due_at INTEGER,
+            status TEXT,
+            completed_at INTEGER,
+            version INTEGER,
+            archived_at INTEGER)''',
+        '''CREATE TABLE IF NOT EXISTS task_tags (
+            tag TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, task_id)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS task_deps (
+            task_id INTEGER NOT NULL,
+            blocker_id INTEGER NOT NULL,
+            PRIMARY KEY (task_id, blocker_id)) WITHOUT ROWID''',
         '''CREATE TABLE IF NOT EXISTS notes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content TEXT)''',
+            content TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            compressed INTEGER NOT NULL DEFAULT 0,
+            preview TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS note_revisions (
+            note_id INTEGER NOT NULL,
+            rev INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at INTEGER,
+            PRIMARY KEY (note_id, rev)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS simhash_bands (
+            kind TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            value INTEGER NOT NULL,
+            ref_id INTEGER NOT NULL,
+            PRIMARY KEY (kind, band, value, ref_id)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS attachments (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            content_type TEXT,
+            created_at INTEGER) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS attachment_links (
+            kind TEXT NOT NULL,
+            ref_id INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            filename TEXT,
+            created_at INTEGER,
+            PRIMARY KEY (kind, ref_id, hash)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            op TEXT NOT NULL,
+            entity_id INTEGER,
+            row TEXT,
+            created_at INTEGER)''',
+        '''CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint BLOB NOT NULL,
+            status INTEGER,
+            content_type TEXT,
+            body BLOB,
+            created_at INTEGER NOT NULL) WITHOUT ROWID''',
         '''CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             content TEXT,
-            date TEXT)''',
+            date TEXT,
+            remind_at INTEGER,
+            version INTEGER NOT NULL DEFAULT 1)''',
         '''CREATE TABLE IF NOT EXISTS weather_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             city TEXT,
             date TEXT,
-            weather TEXT)'''
+            weather TEXT,
+            checked_at INTEGER)''',
+        '''CREATE TABLE IF NOT EXISTS fuzzy_terms (
+            term TEXT PRIMARY KEY) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS fuzzy_grams (
+            gram TEXT NOT NULL,
+            term TEXT NOT NULL,
+            PRIMARY KEY (gram, term)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS fuzzy_postings (
+            term TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            ref_id INTEGER NOT NULL,
+            PRIMARY KEY (term, kind, ref_id)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER)'''
+            ]
+    indexes = [
+        "DROP INDEX IF EXISTS idx_tasks_due_date",
+        "DROP INDEX IF EXISTS idx_reminders_date",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_due_at ON tasks (due_at)",
+        "DROP INDEX IF EXISTS idx_tasks_priority_due",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_next ON tasks (priority, due_at) WHERE status = 'open'",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks (completed_at) WHERE status = 'done'",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_completed_at ON tasks_archive (completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_task_tags_task_id ON task_tags (task_id)",
+        # Archived tasks keep their tags, like their attachments.
+        '''CREATE TRIGGER IF NOT EXISTS task_tags_cleanup AFTER DELETE ON tasks
+            WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id) BEGIN
+            DELETE FROM task_tags WHERE task_id = OLD.id;
+        END''',
+        "CREATE INDEX IF NOT EXISTS idx_task_deps_blocker ON task_deps (blocker_id, task_id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_unblocked ON tasks (priority, due_at) WHERE status = 'open' AND blocked_count = 0",
+        # blocked_count is the number of open blockers a task is waiting on.
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_insert AFTER INSERT ON task_deps
+            WHEN (SELECT status FROM tasks WHERE id = NEW.blocker_id) = 'open' BEGIN
+            UPDATE tasks SET blocked_count = blocked_count + 1 WHERE id = NEW.task_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_delete AFTER DELETE ON task_deps
+            WHEN (SELECT status FROM tasks WHERE id = OLD.blocker_id) = 'open' BEGIN
+            UPDATE tasks SET blocked_count = blocked_count - 1 WHERE id = OLD.task_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_status AFTER UPDATE OF status ON tasks
+            WHEN OLD.status IS NOT NEW.status AND 'open' IN (OLD.status, NEW.status) BEGIN
+            UPDATE tasks SET blocked_count = blocked_count + (CASE NEW.status WHEN 'open' THEN 1 ELSE -1 END)
+            WHERE id IN (SELECT task_id FROM task_deps WHERE blocker_id = NEW.id);
+        END''',
+        # The row is already gone when task_deps_delete fires, so an open blocker releases its dependents here.
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_cleanup AFTER DELETE ON tasks BEGIN
+            UPDATE tasks SET blocked_count = blocked_count - 1
+            WHERE OLD.status = 'open' AND id IN (SELECT task_id FROM task_deps WHERE blocker_id = OLD.id);
+            DELETE FROM task_deps WHERE blocker_id = OLD.id;
+            DELETE FROM task_deps WHERE task_id = OLD.id;
+        END''',
+        "CREATE INDEX IF NOT EXISTS idx_reminders_remind_at ON reminders (remind_at)",
+        "CREATE INDEX IF NOT EXISTS idx_weather_history_checked_at ON weather_history (checked_at)",
+        "CREATE INDEX IF NOT EXISTS idx_fuzzy_postings_ref ON fuzzy_postings (kind, ref_id)",
+        "CREATE INDEX IF NOT EXISTS idx_simhash_bands_ref ON simhash_bands (kind, ref_id)",
+        "CREATE INDEX IF NOT EXISTS idx_attachment_links_hash ON attachment_links (hash)",
+        "CREATE INDEX IF NOT EXISTS idx_changes_entity ON changes (entity, entity_id, seq)",
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)",
+        # Links go with their note/task; archived tasks keep theirs. Orphaned blobs are swept by AttachmentStore.
+        '''CREATE TRIGGER IF NOT EXISTS attachment_links_note_cleanup AFTER DELETE ON notes BEGIN
+            DELETE FROM attachment_links WHERE kind = 'note' AND ref_id = OLD.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS attachment_links_task_cleanup AFTER DELETE ON tasks
+            WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id) BEGIN
+            DELETE FROM attachment_links WHERE kind = 'task' AND ref_id = OLD.id;
+        END'''
             ]
     for q in schema:
         db.execute(q, commit=True)
-    return db
\ No newline at end of file
+    migrate(db)
+    for q in indexes + counter_triggers():
+        db.execute(q, commit=True)
+    return db
+
+def bump(name, delta):
+    # Trigger body fragment: add delta to a dashboard counter, creating it on first use.
+    return (f"INSERT INTO dashboard_counters (name, value) VALUES ({name}, {delta}) "
+            f"ON CONFLICT(name) DO UPDATE SET value = COALESCE(value, 0) + ({delta});")
+
+def counter_triggers():
+    # Keep dashboard_counters in step with every write path, including bulk deletes.
+    last_check = ("INSERT INTO dashboard_counters (name, value) VALUES ('weather_last_checked', "
+                  "(SELECT MAX(checked_at) FROM weather_history)) "
+                  "ON CONFLICT(name) DO UPDATE SET value = excluded.value;")
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS dash_tasks_insert AFTER INSERT ON tasks BEGIN
+            {bump("'tasks'", 1)}
+            {bump("'tasks_priority_' || COALESCE(NEW.priority, 'none')", 1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_tasks_delete AFTER DELETE ON tasks BEGIN
+            {bump("'tasks'", -1)}
+            {bump("'tasks_priority_' || COALESCE(OLD.priority, 'none')", -1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_tasks_priority AFTER UPDATE OF priority ON tasks
+            WHEN OLD.priority IS NOT NEW.priority BEGIN
+            {bump("'tasks_priority_' || COALESCE(OLD.priority, 'none')", -1)}
+            {bump("'tasks_priority_' || COALESCE(NEW.priority, 'none')", 1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_notes_insert AFTER INSERT ON notes BEGIN
+            {bump("'notes'", 1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_notes_delete AFTER DELETE ON notes BEGIN
+            {bump("'notes'", -1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_weather_insert AFTER INSERT ON weather_history BEGIN
+            {bump("'weather_checks'", 1)}
+            {last_check}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS dash_weather_delete AFTER DELETE ON weather_history BEGIN
+            {bump("'weather_checks'", -1)}
+            {last_check}
+        END''',
+            ]
+
+def drop_stale_trigger(db, name, marker):
+    # CREATE TRIGGER IF NOT EXISTS keeps an old body forever; drop it when it lacks `marker` so it is recreated.
+    c = db.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+    row = c.fetchone() if c else None
+    if row and marker not in row[0]:
+        db.execute(f"DROP TRIGGER {name}", commit=True)
+        return True
+    return False
+
+def add_column(db, table, column, decl):
+    c = db.execute(f"PRAGMA table_info({table})")
+    if c and column not in [row[1] for row in c.fetchall()]:
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}", commit=True)
+
+# PRAGMA user_version from which epoch columns hold wall-clock seconds instead of server-local instants.
+WALL_CLOCK_EPOCHS = 1
+
+def rekey_epochs(db):
+    """One-off move of the epoch columns to wall-clock seconds (utils.wall_clock_epoch), so they no
+    longer depend on the timezone the server ran in when they were written."""
+    c = db.execute("PRAGMA user_version")
+    if c.fetchone()[0] >= WALL_CLOCK_EPOCHS:
+        return
+    with db.transaction():
+        # Dates are recomputed from their text, which is the source of truth.
+        for table, text_column, epoch_column in (
+            ("tasks", "due_date", "due_at"), ("tasks_archive", "due_date", "due_at"), ("reminders", "date", "remind_at"),
+        ):
+            c = db.execute(f"SELECT id, {text_column} FROM {table} WHERE {epoch_column} IS NOT NULL")
+            for row_id, text in c.fetchall():
+                db.execute(f"UPDATE {table} SET {epoch_column}=? WHERE id=?", (to_epoch(text), row_id))
+        # Weather checks only keep the date as text; shift the instant to the server's wall clock instead.
+        c = db.execute("SELECT id, checked_at FROM weather_history WHERE checked_at IS NOT NULL")
+        for row_id, checked_at in c.fetchall():
+            wall = wall_clock_epoch(datetime.datetime.fromtimestamp(checked_at))
+            db.execute("UPDATE weather_history SET checked_at=? WHERE id=?", (wall, row_id))
+        db.execute(
+            "UPDATE dashboard_counters SET value = (SELECT MAX(checked_at) FROM weather_history) "
+            "WHERE name = 'weather_last_checked'"
+        )
+        db.execute(f"PRAGMA user_version = {WALL_CLOCK_EPOCHS}")
+
+def backfill_epoch(db, table, text_column, epoch_column, normalize):
+    # Convert legacy free-form text dates; rows that cannot be parsed are left untouched with a NULL epoch.
+    c = db.execute(f"SELECT id, {text_column} FROM {table} WHERE {epoch_column} IS NULL AND {text_column} IS NOT NULL")
+    for row_id, text in (c.fetchall() if c else []):
+        try:
+            normalized = normalize(text)
+            db.execute(f"UPDATE {table} SET {text_column}=?, {epoch_column}=? WHERE id=?", (normalized, to_epoch(normalized), row_id))
+        except (ValueError, OverflowError):
+            logging.warning(f"Cannot convert {table}.{text_column}={text!r} for id {row_id}")
+    db.conn.commit()
+
+NOTE_BODY = "CASE {0}.compressed WHEN 1 THEN zlib_decompress({0}.content) ELSE {0}.content END"
+
+def ensure_notes_fts(db):
+    # External-content full-text index: the FTS table stores only the index and reads bodies
+    # (decompressed) through notes_fts_source, so note text is not stored a second time.
+    # The triggers need zlib_decompress, which DBHelper.connect registers.
+    db.execute(
+        f"CREATE VIEW IF NOT EXISTS notes_fts_source AS SELECT id, {NOTE_BODY.format('notes')} AS content FROM notes",
+        commit=True,
+    )
+    c = db.execute("SELECT sql FROM sqlite_master WHERE name='notes_fts'")
+    row = c.fetchone() if c else None
+    if row is None or "notes_fts_source" not in row[0]:
+        for trigger in ("notes_fts_insert", "notes_fts_delete", "notes_fts_update"):
+            db.execute(f"DROP TRIGGER IF EXISTS {trigger}", commit=True)
+        db.execute("DROP TABLE IF EXISTS notes_fts", commit=True)
+        db.execute(
+            "CREATE VIRTUAL TABLE notes_fts USING fts5(content, content='notes_fts_source', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')",
+            commit=True,
+        )
+        db.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')", commit=True)
+    for q in (
+        f'''CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, content) VALUES (NEW.id, {NOTE_BODY.format('NEW')});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, content) VALUES ('delete', OLD.id, {NOTE_BODY.format('OLD')});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF content, compressed ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, content) VALUES ('delete', OLD.id, {NOTE_BODY.format('OLD')});
+            INSERT INTO notes_fts (rowid, content) VALUES (NEW.id, {NOTE_BODY.format('NEW')});
+        END''',
+    ):
+        db.execute(q, commit=True)
+
+def migrate(db):
+    add_column(db, "tasks", "due_at", "INTEGER")
+    add_column(db, "reminders", "remind_at", "INTEGER")
+    add_column(db, "weather_history", "checked_at", "INTEGER")
+    add_column(db, "tasks", "status", "TEXT NOT NULL DEFAULT 'open'")
+    add_column(db, "tasks", "completed_at", "INTEGER")
+    add_column(db, "tasks", "blocked_count", "INTEGER NOT NULL DEFAULT 0")
+    add_column(db, "tasks_archive", "version", "INTEGER")
+    for table in ("tasks", "notes", "reminders"):
+        add_column(db, table, "version", "INTEGER NOT NULL DEFAULT 1")
+    add_column(db, "notes", "compressed", "INTEGER NOT NULL DEFAULT 0")
+    add_column(db, "notes", "preview", "TEXT")
+    add_column(db, "notes", "simhash", "INTEGER")
+    add_column(db, "tasks", "simhash", "INTEGER")
+    ensure_notes_fts(db)
+    drop_stale_trigger(db, "task_tags_cleanup", "tasks_archive")
+    if any([drop_stale_trigger(db, name, "'none')") for name in ("dash_tasks_insert", "dash_tasks_delete", "dash_tasks_priority")]):
+        # Counters may already hold NULL-named rows for tasks without a priority; start over and let
+        # DashboardManager rebuild them on startup.
+        db.execute("DELETE FROM dashboard_counters", commit=True)
+    backfill_epoch(db, "tasks", "due_date", "due_at", normalize_date)
+    backfill_epoch(db, "reminders", "date", "remind_at", normalize_datetime)
+    backfill_epoch(db, "weather_history", "date", "checked_at", normalize_date)
+    rekey_epochs(db)
\ No newline at end of file
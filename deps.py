@@ -0,0 +1,103 @@
+from db import DBHelper
+from tasks import TASK_COLUMNS
+
+class DependencyCycleError(ValueError):
+    pass
+
+class DependencyManager:
+    """Blocked-by edges between tasks.
+
+    Edges live in task_deps; tasks.blocked_count (maintained by triggers in init_db) counts each
+    task's open blockers, so "what can I do now" is an indexed read of blocked_count = 0.
+    Traversals walk the graph one level per query and only visit the affected subgraph.
+    """
+
+    def __init__(self, db: DBHelper):
+        self.db = db
+
+    def _walk(self, start_ids, max_depth=None, stop_at=None):
+        """Breadth-first walk along blocked-by edges. Returns {task_id: depth}, or None early if stop_at is reached."""
+        seen = {}
+        frontier = list(start_ids)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            marks = ",".join("?" * len(frontier))
+            c = self.db.execute(f"SELECT DISTINCT blocker_id FROM task_deps WHERE task_id IN ({marks})", tuple(frontier))
+            frontier = []
+            for (blocker_id,) in (c.fetchall() if c else []):
+                if blocker_id == stop_at:
+                    return None
+                if blocker_id not in seen:
+                    seen[blocker_id] = depth
+                    frontier.append(blocker_id)
+        return seen
+
+    def add_dependency(self, task_id, blocker_id):
+        """Record that task_id is blocked by blocker_id. Raises DependencyCycleError if that would close a cycle."""
+        if task_id == blocker_id:
+            raise DependencyCycleError("A task cannot block itself")
+        with self.db.transaction():
+            # The new edge closes a cycle only if task_id already (transitively) blocks blocker_id.
+            if self._walk([blocker_id], stop_at=task_id) is None:
+                raise DependencyCycleError(f"Task {blocker_id} already depends on task {task_id}")
+            c = self.db.execute("INSERT OR IGNORE INTO task_deps (task_id, blocker_id) VALUES (?, ?)", (task_id, blocker_id))
+            return c.rowcount == 1
+
+    def remove_dependency(self, task_id, blocker_id):
+        c = self.db.execute("DELETE FROM task_deps WHERE task_id=? AND blocker_id=?", (task_id, blocker_id), commit=True)
+        return bool(c and c.rowcount)
+
+    def get_blockers(self, task_id, max_depth=None):
+        """Transitive blockers of a task in a valid execution order (every blocker before what it blocks)."""
+        depths = self._walk([task_id], max_depth=max_depth)
+        if not depths:
+            return []
+        ids = list(depths)
+        marks = ",".join("?" * len(ids))
+        c = self.db.execute(f"SELECT {TASK_COLUMNS}, blocked_count FROM tasks WHERE id IN ({marks})", tuple(ids))
+        rows = {r[0]: r for r in (c.fetchall() if c else [])}
+        c = self.db.execute(
+            f"SELECT task_id, blocker_id FROM task_deps WHERE task_id IN ({marks}) AND blocker_id IN ({marks})",
+            tuple(ids) * 2,
+        )
+        edges = c.fetchall() if c else []
+        return [
+            {"task": rows[i], "depth": depths[i]}
+            for i in topological_order(ids, edges)
+            if i in rows
+        ]
+
+    def get_dependents(self, task_id):
+        c = self.db.execute(
+            f"SELECT {', '.join('t.' + col for col in TASK_COLUMNS.split(', '))}, t.blocked_count "
+            "FROM task_deps d JOIN tasks t ON t.id = d.task_id WHERE d.blocker_id = ? ORDER BY t.id",
+            (task_id,),
+        )
+        return c.fetchall() if c else []
+
+    def get_unblocked(self, limit=50):
+        c = self.db.execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE status = 'open' AND blocked_count = 0 ORDER BY priority, due_at LIMIT ?",
+            (limit,),
+        )
+        return c.fetchall() if c else []
+
+def topological_order(ids, edges):
+    """Kahn's algorithm over (task_id, blocker_id) edges; ties broken by id for stable output."""
+    waiting = {i: 0 for i in ids}
+    unlocks = {i: [] for i in ids}
+    for task_id, blocker_id in edges:
+        waiting[task_id] += 1
+        unlocks[blocker_id].append(task_id)
+    ready = sorted(i for i, n in waiting.items() if n == 0)
+    order = []
+    while ready:
+        i = ready.pop(0)
+        order.append(i)
+        for j in unlocks[i]:
+            waiting[j] -= 1
+            if waiting[j] == 0:
+                ready.append(j)
+        ready.sort()
+    return order
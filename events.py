@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import itertools
+import json
+import threading
+
+class ChangeBus:
+    """Fan-out of manager writes to secondary indexes and change feeds.
+
+    Managers publish one event per logical write from inside that write's transaction, so a
+    subscriber that writes to the database commits (or rolls back) together with the change.
+    Events are dicts: {"entity", "op", "id", "row"} where op is create/update/delete/clear and
+    row is the new row as a dict for create/update, else None. Subscribers registered with
+    after_commit=True (change feeds leaving the process) only see events that were committed.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self.subscribers = []
+        self.committed_subscribers = []
+
+    def subscribe(self, callback, after_commit=False):
+        (self.committed_subscribers if after_commit else self.subscribers).append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        for subscribers in (self.subscribers, self.committed_subscribers):
+            if callback in subscribers:
+                subscribers.remove(callback)
+
+    def publish(self, entity, op, entity_id=None, row=None):
+        event = {"entity": entity, "op": op, "id": entity_id, "row": row}
+        for callback in self.subscribers:
+            callback(event)
+        for callback in list(self.committed_subscribers):
+            if self.db is None:
+                callback(event)
+            else:
+                self.db.after_commit(functools.partial(callback, event))
+
+
+class EventStream:
+    """Server-Sent Events fan-out of committed changes to connected clients.
+
+    Each client has a bounded asyncio.Queue filled from writer threads via call_soon_threadsafe.
+    A client that falls queue_size events behind is not allowed to hold memory or slow anyone
+    down: its backlog is dropped and it gets a single "resync" event telling it to refetch.
+    """
+
+    RESYNC = "event: resync\ndata: {}\n\n"
+
+    def __init__(self, queue_size=256, heartbeat_seconds=15):
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.seq = itertools.count(1)
+
+    def publish(self, event):
+        data = json.dumps(event, separators=(",", ":"), default=str)
+        message = f"id: {next(self.seq)}\nevent: change\ndata: {data}\n\n"
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            client["loop"].call_soon_threadsafe(self._offer, client, event["entity"], message)
+
+    def _offer(self, client, entity, message):
+        # Runs on the client's event loop.
+        if client["resync"] or (client["entities"] and entity not in client["entities"]):
+            return
+        queue = client["queue"]
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            client["resync"] = True
+            queue.put_nowait(self.RESYNC)
+            return
+        queue.put_nowait(message)
+
+    async def stream(self, entities=None):
+        """Async generator of SSE messages for one client, with heartbeat comments while idle."""
+        client = {
+            "loop": asyncio.get_running_loop(),
+            "queue": asyncio.Queue(self.queue_size),
+            "entities": set(entities or ()),
+            "resync": False,
+        }
+        with self.lock:
+            self.clients[id(client)] = client
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(client["queue"].get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is self.RESYNC:
+                    client["resync"] = False
+                yield message
+        finally:
+            with self.lock:
+                self.clients.pop(id(client), None)
@@ -0,0 +1,130 @@
+import re
+from db import DBHelper
+from notes import decode_content
+
+WORD_RE = re.compile(r"\w{2,}", re.UNICODE)
+
+def words(text):
+    return {w.lower() for w in WORD_RE.findall(text or "")}
+
+def trigrams(word):
+    # pg_trgm style padding so that short words and word starts still share grams.
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a, b):
+    ga, gb = trigrams(a), trigrams(b)
+    shared = len(ga & gb)
+    return shared / (len(ga) + len(gb) - shared)
+
+class FuzzyIndex:
+    """Typo-tolerant search over note content and task titles/descriptions.
+
+    The vocabulary is indexed by trigram (fuzzy_grams) and each term has a posting list of the
+    notes/tasks containing it (fuzzy_postings). A query word is matched to vocabulary terms by
+    trigram overlap, then to documents through the postings, so no row text is scanned.
+    """
+
+    SOURCES = {
+        "task": "SELECT id, title || ' ' || description FROM tasks",
+        "note": "SELECT id, content, compressed FROM notes",
+    }
+    CANDIDATE_TERMS = 50
+
+    def __init__(self, db: DBHelper, threshold=0.3):
+        self.db = db
+        self.threshold = threshold
+
+    @staticmethod
+    def text_of(kind, row):
+        if kind == "task":
+            return f"{row.get('title') or ''} {row.get('description') or ''}"
+        return row.get("content") or ""
+
+    def handle(self, event):
+        kind = event["entity"]
+        if kind not in self.SOURCES:
+            return
+        if event["op"] in ("create", "update") and event["row"]:
+            self.index(kind, event["id"], self.text_of(kind, event["row"]))
+        elif event["op"] == "delete":
+            self.index(kind, event["id"], "")
+        elif event["op"] == "clear":
+            self.db.execute("DELETE FROM fuzzy_postings WHERE kind=?", (kind,))
+            self.prune()
+
+    def index(self, kind, ref_id, text):
+        """Bring the postings of one document in line with its text, touching only the terms that changed."""
+        new_terms = words(text)
+        c = self.db.execute("SELECT term FROM fuzzy_postings WHERE kind=? AND ref_id=?", (kind, ref_id))
+        old_terms = {r[0] for r in c.fetchall()}
+        for term in old_terms - new_terms:
+            self.db.execute("DELETE FROM fuzzy_postings WHERE term=? AND kind=? AND ref_id=?", (term, kind, ref_id))
+            if not self.db.execute("SELECT 1 FROM fuzzy_postings WHERE term=? LIMIT 1", (term,)).fetchone():
+                self.drop_term(term)
+        for term in new_terms - old_terms:
+            self.db.execute("INSERT INTO fuzzy_postings (term, kind, ref_id) VALUES (?, ?, ?)", (term, kind, ref_id))
+            if self.db.execute("INSERT OR IGNORE INTO fuzzy_terms (term) VALUES (?)", (term,)).rowcount:
+                for gram in trigrams(term):
+                    self.db.execute("INSERT OR IGNORE INTO fuzzy_grams (gram, term) VALUES (?, ?)", (gram, term))
+
+    def drop_term(self, term):
+        self.db.execute("DELETE FROM fuzzy_terms WHERE term=?", (term,))
+        for gram in trigrams(term):
+            self.db.execute("DELETE FROM fuzzy_grams WHERE gram=? AND term=?", (gram, term))
+
+    def prune(self):
+        """Drop vocabulary no document uses any more, so dead terms cannot crowd live ones out of the
+        candidate list in similar_terms."""
+        c = self.db.execute(
+            "SELECT term FROM fuzzy_terms t WHERE NOT EXISTS (SELECT 1 FROM fuzzy_postings p WHERE p.term = t.term)"
+        )
+        orphans = [r[0] for r in (c.fetchall() if c else [])]
+        with self.db.transaction():
+            for term in orphans:
+                self.drop_term(term)
+        return len(orphans)
+
+    def is_empty(self):
+        c = self.db.execute("SELECT 1 FROM fuzzy_postings LIMIT 1")
+        return not (c and c.fetchone())
+
+    def rebuild(self):
+        with self.db.transaction():
+            self.db.execute("DELETE FROM fuzzy_postings")
+            for kind, query in self.SOURCES.items():
+                for row in self.db.execute(query).fetchall():
+                    text = decode_content(row[1], row[2]) if kind == "note" else row[1]
+                    self.index(kind, row[0], text)
+            self.prune()
+
+    def similar_terms(self, word):
+        grams = trigrams(word)
+        marks = ",".join("?" * len(grams))
+        c = self.db.execute(
+            f"SELECT term FROM fuzzy_grams WHERE gram IN ({marks}) GROUP BY term ORDER BY COUNT(*) DESC LIMIT ?",
+            (*grams, self.CANDIDATE_TERMS),
+        )
+        scored = {term: similarity(word, term) for (term,) in (c.fetchall() if c else [])}
+        return {term: score for term, score in scored.items() if score >= self.threshold}
+
+    def search(self, query, limit=20):
+        """Documents ranked by the summed best similarity of each query word. Returns [(kind, id, score, terms)]."""
+        scores = {}
+        matched = {}
+        for word in words(query):
+            terms = self.similar_terms(word)
+            if not terms:
+                continue
+            marks = ",".join("?" * len(terms))
+            c = self.db.execute(f"SELECT term, kind, ref_id FROM fuzzy_postings WHERE term IN ({marks})", tuple(terms))
+            best = {}
+            for term, kind, ref_id in c.fetchall():
+                key = (kind, ref_id)
+                if terms[term] > best.get(key, (0, None))[0]:
+                    best[key] = (terms[term], term)
+            for key, (score, term) in best.items():
+                scores[key] = scores.get(key, 0) + score
+                matched.setdefault(key, []).append(term)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(kind, ref_id, round(score, 3), matched[(kind, ref_id)]) for (kind, ref_id), score in ranked]
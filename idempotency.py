@@ -0,0 +1,136 @@
+import hashlib
+import json
+import re
+import time
+from starlette.concurrency import run_in_threadpool
+from db import DBHelper
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Raw file uploads are streamed straight to disk; their keys cover method, path and query only.
+UNHASHED_BODY = re.compile(r"^/(notes|tasks)/\d+/attachments$")
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated Idempotency-Key instead of running the write again.
+
+    The first request with a key claims it with a pending row in idempotency_keys; its response
+    (status, content type, body) is saved when it completes. Retries with the same key and request
+    fingerprint get that response back with Idempotent-Replayed: true, a retry that races the
+    first one gets 409, and reusing a key for a different request gets 422. Server errors release
+    the key so the client can retry. A pending claim is a lease of lease_seconds: if the process
+    died mid-request, a retry after that takes the key over instead of getting 409 until expiry.
+    Keys expire after ttl_hours.
+    """
+
+    def __init__(self, app, db: DBHelper, ttl_hours=24, lease_seconds=120):
+        self.app = app
+        self.db = db
+        self.ttl = int(ttl_hours * 3600)
+        self.lease = lease_seconds
+        self.last_purge = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            return await self.app(scope, receive, send)
+        key = dict(scope["headers"]).get(b"idempotency-key")
+        if not key:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1")[:255]
+
+        digest = hashlib.sha256(f"{scope['method']} {scope['path']}?{scope['query_string'].decode()}\n".encode())
+        if UNHASHED_BODY.match(scope["path"]):
+            body = None
+        else:
+            body = await read_body(receive)
+            digest.update(body)
+        fingerprint = digest.digest()[:16]
+
+        stored = await run_in_threadpool(self.claim, key, fingerprint)
+        if stored is not None:
+            stored_fingerprint, status, content_type, payload = stored
+            if stored_fingerprint != fingerprint:
+                return await respond(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+            if status is None:
+                return await respond(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+            return await respond(send, status, payload, content_type, replayed=True)
+
+        response = {"status": 500, "content_type": None, "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = dict(message.get("headers", [])).get(b"content-type")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive if body is None else replay(body), capture)
+        except BaseException:
+            await run_in_threadpool(self.release, key)
+            raise
+        if response["status"] >= 500:
+            await run_in_threadpool(self.release, key)
+        else:
+            await run_in_threadpool(
+                self.store, key, response["status"], response["content_type"], b"".join(response["body"])
+            )
+
+    def claim(self, key, fingerprint):
+        """None if this request now owns the key, else the stored (fingerprint, status, content_type, body);
+        status is None while the first request is still running and its lease has not run out."""
+        now = int(time.time())
+        with self.db.transaction():
+            if now - self.last_purge > 3600:
+                self.db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - self.ttl,))
+                self.last_purge = now
+            # created_at is the claim time; pending rows past their lease are treated as absent.
+            c = self.db.execute(
+                "SELECT fingerprint, status, content_type, body FROM idempotency_keys "
+                "WHERE key=? AND created_at >= CASE WHEN status IS NULL THEN ? ELSE ? END",
+                (key, now - self.lease, now - self.ttl),
+            )
+            row = c.fetchone()
+            if row is None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)",
+                    (key, fingerprint, now),
+                )
+        return row
+
+    def store(self, key, status, content_type, body):
+        self.db.execute(
+            "UPDATE idempotency_keys SET status=?, content_type=?, body=? WHERE key=?",
+            (status, content_type.decode("latin-1") if content_type else None, body, key),
+            commit=True,
+        )
+
+    def release(self, key):
+        self.db.execute("DELETE FROM idempotency_keys WHERE key=? AND status IS NULL", (key,), commit=True)
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+def replay(body):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    return receive
+
+async def respond(send, status, payload, content_type="application/json", replayed=False):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    headers = [(b"content-type", (content_type or "application/json").encode("latin-1")),
+               (b"content-length", str(len(body)).encode())]
+    if replayed:
+        headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
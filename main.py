@@ -3,26 +3,126 @@ import logging
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logging.getLogger("urllib3").setLevel(logging.ERROR)
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
+import asyncio
+import calendar
+from contextlib import asynccontextmanager
 import datetime
+import threading
+from typing import List, Optional
 import uvicorn
-from db import init_db
-from utils import load_config, setup_logging
-from tasks import TaskManager
+from db import VersionConflictError, init_db
+from utils import epoch_range, load_config, normalize_date, normalize_datetime, setup_logging, to_epoch
+from tasks import TASK_STATUSES, TaskManager
 from notes import NotesManager
 from reminders import ReminderManager
-from weather import WeatherManager
-from fastapi import FastAPI
+from weather import WEATHER_FIELDS, WeatherManager
+from timeline import TimelineManager
+from dashboard import DashboardManager
+from archive import TaskArchiver
+from deps import DependencyCycleError, DependencyManager
+from events import ChangeBus, EventStream
+from fuzzy import FuzzyIndex
+from suggest import SuggestIndex
+from revisions import RevisionStore
+from render import RenderCache
+from related import RelatedNotesIndex
+from simhash import DuplicateDetector
+from sync import ChangeLog
+from ops import OperationError, OperationRegistry
+from idempotency import IdempotencyMiddleware
+from serialization import (
+    DEFAULT_RESPONSE_CLASS,
+    ArchivedTaskListResponse,
+    AttachmentListResponse,
+    BlockerList,
+    DuplicateReportResponse,
+    FuzzySearchResponse,
+    NoteListResponse,
+    NoteSearchResponse,
+    RelatedNotesResponse,
+    ReminderListResponse,
+    RevisionListResponse,
+    SuggestionList,
+    SyncResponse,
+    TagListResponse,
+    TaskListResponse,
+    TaskTagList,
+    TimelineResponse,
+    TodaysRemindersResponse,
+    WeatherHistoryResponse,
+)
+from attachments import AttachmentStore, AttachmentTooLargeError, HASH_RE, parse_byte_range
+from fastapi import BackgroundTasks, FastAPI, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi import HTTPException
 
 config = load_config()
 setup_logging(config['app']['debug'])
 db = init_db(config["database"])
-task_mgr = TaskManager(db)
-notes_mgr = NotesManager(db)
-reminder_mgr = ReminderManager(db)
-weather_mgr = WeatherManager(db)
-app = FastAPI()
+bus = ChangeBus(db)
+event_stream = EventStream(**config.get("events", {}))
+ws_config = config.get("websocket", {})
+bus.subscribe(event_stream.publish, after_commit=True)
+task_mgr = TaskManager(db, next_cache=config.get("tasks", {}).get("next_cache", False), bus=bus)
+notes_config = dict(config.get("notes", {}))
+revision_store = RevisionStore(db, notes_config.pop("revision_snapshot_every", 10))
+render_cache = RenderCache(notes_config.pop("render_cache_size", 512))
+notes_mgr = NotesManager(db, bus, revisions=revision_store, **notes_config)
+notes_mgr.compress_existing()
+reminder_mgr = ReminderManager(db, bus)
+weather_mgr = WeatherManager(db, bus)
+fuzzy_index = FuzzyIndex(db)
+bus.subscribe(fuzzy_index.handle)
+if fuzzy_index.is_empty():
+    fuzzy_index.rebuild()
+else:
+    fuzzy_index.prune()
+suggest_index = SuggestIndex()
+bus.subscribe(suggest_index.handle, after_commit=True)
+related_index = RelatedNotesIndex()
+bus.subscribe(related_index.handle, after_commit=True)
+duplicate_detector = DuplicateDetector(db)
+bus.subscribe(duplicate_detector.handle)
+duplicate_detector.index_missing()
+change_log = ChangeLog(db, preview_chars=notes_mgr.preview_chars, **config.get("sync", {}))
+bus.subscribe(change_log.handle)
+if change_log.is_empty():
+    change_log.seed(
+        [("task", t[0], task_mgr.get_task(t[0])) for t in task_mgr.get_tasks()]
+        + [("note", n[0], notes_mgr.get_note(n[0])) for n in notes_mgr.get_notes(preview=True)]
+        + [("reminder", r[0], reminder_mgr.get_reminder(r[0])) for r in reminder_mgr.get_all_reminders()]
+        + [("weather", w[0], dict(zip(WEATHER_FIELDS, w))) for w in weather_mgr.get_weather_history()[::-1]]
+    )
+attachment_store = AttachmentStore(db, **config.get("attachments", {}))
+attachment_store.collect_garbage()
+timeline_mgr = TimelineManager(db)
+deps_mgr = DependencyManager(db)
+dashboard_mgr = DashboardManager(db)
+if not dashboard_mgr.is_initialized():
+    dashboard_mgr.rebuild()
+archiver = TaskArchiver(db, bus=bus, **config.get("archive", {}))
+
+@asynccontextmanager
+async def lifespan(app):
+    suggest_index.load("task", [(t[0], t[1]) for t in task_mgr.get_tasks()])
+    suggest_index.load("note", [(n[0], SuggestIndex.label_of("note", {"content": n[1]})) for n in notes_mgr.get_notes(preview=True)])
+    suggest_index.load("reminder", [(r[0], r[1]) for r in reminder_mgr.get_all_reminders()])
+    related_index.load((n[0], n[1]) for n in notes_mgr.get_notes())
+    archiver.start()
+    # Compaction can take a while on a large log; serve requests meanwhile.
+    threading.Thread(target=change_log.compact, name="change-log-compact", daemon=True).start()
+    yield
+    archiver.stop()
+
+app = FastAPI(lifespan=lifespan, default_response_class=DEFAULT_RESPONSE_CLASS)
+@app.exception_handler(VersionConflictError)
+def version_conflict_handler(request, exc: VersionConflictError):
+    return JSONResponse(status_code=409, content={"detail": str(exc), "current_version": exc.current_version})
+
+app.add_middleware(IdempotencyMiddleware, db=db, **config.get("idempotency", {}))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -31,35 +131,230 @@ app.add_middleware(
     allow_headers=["*"],
     )
 
+def storable_date(value, normalize):
+    # A date is only valid if it also has an epoch form; otherwise it would pass validation and fail on insert.
+    try:
+        normalized = normalize(value)
+        to_epoch(normalized)
+    except OverflowError:
+        raise ValueError(f"Date out of range: {value!r}")
+    return normalized
+
 class Task(BaseModel):
     title: str
     description: str
     due_date: str
     priority: int = 1
+    tags: Optional[List[str]] = None
+    version: Optional[int] = None
+
+    @field_validator("due_date")
+    @classmethod
+    def check_due_date(cls, value):
+        return storable_date(value, normalize_date)
+
+class TaskPatch(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    due_date: Optional[str] = None
+    priority: Optional[int] = None
+    tags: Optional[List[str]] = None
+    version: Optional[int] = None
+
+    @field_validator("due_date")
+    @classmethod
+    def check_due_date(cls, value):
+        return storable_date(value, normalize_date) if value is not None else value
+
+class TaskTags(BaseModel):
+    tags: List[str]
+
+class TaskBlocker(BaseModel):
+    blocker_id: int
 
 class Note(BaseModel):
     content: str
+    version: Optional[int] = None
 
 class Reminder(BaseModel):
     content: str
     date: str
+    version: Optional[int] = None
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value):
+        return storable_date(value, normalize_datetime)
+
+class NotePatch(BaseModel):
+    content: Optional[str] = None
+    version: Optional[int] = None
+
+class ReminderPatch(BaseModel):
+    content: Optional[str] = None
+    date: Optional[str] = None
+    version: Optional[int] = None
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value):
+        return storable_date(value, normalize_datetime) if value is not None else value
+
+def patch_fields(patch):
+    # Only fields the client actually sent; explicit nulls are treated as "leave unchanged".
+    return {k: v for k, v in patch.model_dump(exclude_unset=True, exclude={"version"}).items() if v is not None}
+
+def patch_result(result, entity):
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{entity} not found")
+    changed, version = result
+    return {"message": f"{entity} updated" if changed else "No changes", "version": version}
+
+def update_result(version, entity):
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"{entity} not found")
+    return {"message": f"{entity} updated", "version": version}
+
+def expected_version(if_match, body_version):
+    """The version a write is conditional on: the If-Match header (ETag-style quoting allowed) or the body field."""
+    if if_match is None or if_match.strip() == "*":
+        return body_version
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a row version number")
+
+def parse_range(start, end):
+    try:
+        return epoch_range(start, end)
+    except (ValueError, OverflowError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/tasks")
 def create_task(task: Task):
-    task_mgr.add_task(task.title, task.description, task.due_date, task.priority)
-    return {"message": "Task added"}
+    task_id = task_mgr.add_task(task.title, task.description, task.due_date, task.priority, task.tags)
+    duplicates = duplicate_detector.duplicates_of("task", task_id)
+    if duplicates:
+        return {"message": "Task added", "id": task_id, "duplicates": duplicates}
+    return {"message": "Task added", "id": task_id}
 
-@app.get("/tasks")
-def read_tasks():
-    tasks = task_mgr.get_tasks()
+@app.get("/tasks", response_model=TaskListResponse)
+def read_tasks(
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern=f"^({'|'.join(TASK_STATUSES)})$"),
+    tags: Optional[str] = None,
+    match: str = Query("all", pattern="^(all|any)$"),
+):
+    tag_list = tags.split(",") if tags else None
+    if due_from or due_to:
+        tasks = task_mgr.get_tasks_due_between(*parse_range(due_from, due_to), tags=tag_list, match=match, status=status)
+    else:
+        tasks = task_mgr.get_tasks(status, tags=tag_list, match=match)
     if not tasks:
         return {"message": "No tasks found."}
     return {"tasks": tasks}
 
+@app.get("/tasks/next", response_model=TaskListResponse)
+def read_next_tasks(k: int = Query(10, ge=1, le=100)):
+    tasks = task_mgr.get_next_tasks(k)
+    if not tasks:
+        return {"message": "No tasks found."}
+    return {"tasks": tasks}
+
+@app.get("/tags", response_model=TagListResponse)
+def read_tags():
+    tags = task_mgr.get_all_tags()
+    if not tags:
+        return {"message": "No tags found."}
+    return {"tags": [{"tag": t, "count": n} for t, n in tags]}
+
+@app.get("/tasks/{task_id}/tags", response_model=TaskTagList)
+def read_task_tags(task_id: int):
+    return {"tags": task_mgr.get_task_tags(task_id)}
+
+@app.post("/tasks/{task_id}/tags")
+def add_task_tags(task_id: int, body: TaskTags):
+    if db.get_version("tasks", task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task_mgr.add_tags(task_id, body.tags)
+    return {"message": "Tags added", "tags": task_mgr.get_task_tags(task_id)}
+
+@app.delete("/tasks/{task_id}/tags/{tag}")
+def remove_task_tag(task_id: int, tag: str):
+    if db.get_version("tasks", task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task_mgr.remove_tag(task_id, tag)
+    return {"message": "Tag removed"}
+
+@app.get("/tasks/unblocked", response_model=TaskListResponse)
+def read_unblocked_tasks(limit: int = Query(50, ge=1, le=500)):
+    tasks = deps_mgr.get_unblocked(limit)
+    if not tasks:
+        return {"message": "No unblocked tasks."}
+    return {"tasks": tasks}
+
+@app.get("/tasks/{task_id}/blockers", response_model=BlockerList)
+def read_task_blockers(task_id: int, depth: Optional[int] = Query(None, ge=1, le=100)):
+    return {"blockers": deps_mgr.get_blockers(task_id, depth), "dependents": deps_mgr.get_dependents(task_id)}
+
+@app.post("/tasks/{task_id}/blockers")
+def add_task_blocker(task_id: int, body: TaskBlocker):
+    existing = {t[0] for t in task_mgr.get_tasks_by_ids([task_id, body.blocker_id])}
+    if existing != {task_id, body.blocker_id}:
+        raise HTTPException(status_code=404, detail="Task not found")
+    try:
+        deps_mgr.add_dependency(task_id, body.blocker_id)
+    except DependencyCycleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Blocker added"}
+
+@app.delete("/tasks/{task_id}/blockers/{blocker_id}")
+def remove_task_blocker(task_id: int, blocker_id: int):
+    if db.get_version("tasks", task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    deps_mgr.remove_dependency(task_id, blocker_id)
+    return {"message": "Blocker removed"}
+
+@app.get("/tasks/archive", response_model=ArchivedTaskListResponse)
+def read_archived_tasks(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    tasks = task_mgr.get_archived_tasks(limit, offset)
+    if not tasks:
+        return {"message": "No archived tasks found."}
+    return {"tasks": tasks}
+
+@app.post("/tasks/archive/run")
+def run_task_archiver(background_tasks: BackgroundTasks):
+    background_tasks.add_task(archiver.run_once)
+    return {"message": "Task archival started"}
+
+@app.post("/tasks/{task_id}/complete")
+def complete_task(task_id: int):
+    if not task_mgr.set_status(task_id, "done"):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return {"message": "Task completed"}
+
+@app.post("/tasks/{task_id}/reopen")
+def reopen_task(task_id: int):
+    if not task_mgr.set_status(task_id, "open"):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return {"message": "Task reopened"}
+
 @app.put("/tasks/{task_id}")
-def update_task(task_id: int, task: Task):
-    task_mgr.edit_task(task_id, task.title, task.description, task.due_date, task.priority)
-    return {"message": "Task updated"}
+def update_task(task_id: int, task: Task, if_match: Optional[str] = Header(None)):
+    version = task_mgr.edit_task(
+        task_id, task.title, task.description, task.due_date, task.priority, task.tags,
+        expected_version=expected_version(if_match, task.version),
+    )
+    return update_result(version, "Task")
+
+@app.patch("/tasks/{task_id}")
+def patch_task(task_id: int, patch: TaskPatch, if_match: Optional[str] = Header(None)):
+    result = task_mgr.patch_task(task_id, patch_fields(patch), expected_version(if_match, patch.version))
+    return patch_result(result, "Task")
 
 @app.delete("/tasks/clear_all")
 def delete_all_tasks():
@@ -73,20 +368,71 @@ def delete_task(task_id: int):
 
 @app.post("/notes")
 def create_note(note: Note):
-    notes_mgr.add_note(note.content)
-    return {"message": "Note added"}
+    note_id = notes_mgr.add_note(note.content)
+    duplicates = duplicate_detector.duplicates_of("note", note_id)
+    if duplicates:
+        return {"message": "Note added", "id": note_id, "duplicates": duplicates}
+    return {"message": "Note added", "id": note_id}
 
-@app.get("/notes")
-def read_notes():
-    notes = notes_mgr.get_notes()
+@app.get("/notes", response_model=NoteListResponse)
+def read_notes(preview: bool = False, format: str = Query("text", pattern="^(text|html)$")):
+    # HTML lists always render the stored previews; full bodies are rendered per note.
+    notes = notes_mgr.get_notes(preview or format == "html")
     if not notes:
         return {"message": "No notes found."}
+    if format == "html":
+        notes = [(note_id, render_cache.render(text), version) for note_id, text, version in notes]
     return {"notes": notes}
 
+@app.get("/notes/search", response_model=NoteSearchResponse)
+def search_notes(q: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    results, has_more = notes_mgr.search_notes(q, limit, offset)
+    if not results:
+        return {"message": "No matching notes."}
+    return {"results": results, "next_offset": offset + limit if has_more else None}
+
+@app.get("/notes/{note_id}")
+def read_note(note_id: int, format: str = Query("text", pattern="^(text|html)$")):
+    note = notes_mgr.get_note(note_id)
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if format == "html":
+        note["html"] = render_cache.render(note["content"])
+    return {"note": note}
+
+@app.get("/notes/{note_id}/related", response_model=RelatedNotesResponse)
+def read_related_notes(note_id: int, k: int = Query(5, ge=1, le=50)):
+    related = related_index.related(note_id, k)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if not related:
+        return {"message": "No related notes found."}
+    previews = notes_mgr.get_previews(other for other, _ in related)
+    return {"related": [{"id": other, "score": score, "preview": previews.get(other)} for other, score in related]}
+
+@app.get("/notes/{note_id}/revisions", response_model=RevisionListResponse)
+def read_note_revisions(note_id: int):
+    revisions = revision_store.list(note_id)
+    if not revisions:
+        return {"message": "No revisions found."}
+    return {"revisions": revisions}
+
+@app.get("/notes/{note_id}/revisions/{rev}")
+def read_note_revision(note_id: int, rev: int):
+    content = revision_store.get(note_id, rev)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"note_id": note_id, "rev": rev, "content": content}
+
 @app.put("/notes/{note_id}")
-def update_note(note_id: int, note: Note):
-    notes_mgr.edit_note(note_id, note.content)
-    return {"message": "Note updated"}
+def update_note(note_id: int, note: Note, if_match: Optional[str] = Header(None)):
+    version = notes_mgr.edit_note(note_id, note.content, expected_version(if_match, note.version))
+    return update_result(version, "Note")
+
+@app.patch("/notes/{note_id}")
+def patch_note(note_id: int, patch: NotePatch, if_match: Optional[str] = Header(None)):
+    result = notes_mgr.patch_note(note_id, patch_fields(patch), expected_version(if_match, patch.version))
+    return patch_result(result, "Note")
 
 @app.delete("/notes/clear_all")
 def delete_all_notes():
@@ -100,17 +446,20 @@ def delete_note(note_id: int):
 
 @app.post("/reminders")
 def create_reminder(reminder: Reminder):
-    reminder_mgr.add_reminder(reminder.content, reminder.date)
-    return {"message": "Reminder added"}
+    reminder_id = reminder_mgr.add_reminder(reminder.content, reminder.date)
+    return {"message": "Reminder added", "id": reminder_id}
 
-@app.get("/reminders")
-def read_reminders():
-    reminders = reminder_mgr.get_all_reminders()
+@app.get("/reminders", response_model=ReminderListResponse)
+def read_reminders(date_from: Optional[str] = Query(None, alias="from"), date_to: Optional[str] = Query(None, alias="to")):
+    if date_from or date_to:
+        reminders = reminder_mgr.get_reminders_between(*parse_range(date_from, date_to))
+    else:
+        reminders = reminder_mgr.get_all_reminders()
     if not reminders:
         return {"message": "No reminders found."}
     return {"reminders": reminders}
 
-@app.get("/reminders/today")
+@app.get("/reminders/today", response_model=TodaysRemindersResponse)
 def read_todays_reminders():
     today = datetime.date.today().isoformat()
     today_reminders = reminder_mgr.get_todays_reminders(today)
@@ -119,9 +468,16 @@ def read_todays_reminders():
     return {"today_reminders": today_reminders}
 
 @app.put("/reminders/{reminder_id}")
-def update_reminder(reminder_id: int, reminder: Reminder):
-    reminder_mgr.edit_reminder(reminder_id, reminder.content, reminder.date)
-    return {"message": "Reminder updated"}
+def update_reminder(reminder_id: int, reminder: Reminder, if_match: Optional[str] = Header(None)):
+    version = reminder_mgr.edit_reminder(
+        reminder_id, reminder.content, reminder.date, expected_version(if_match, reminder.version)
+    )
+    return update_result(version, "Reminder")
+
+@app.patch("/reminders/{reminder_id}")
+def patch_reminder(reminder_id: int, patch: ReminderPatch, if_match: Optional[str] = Header(None)):
+    result = reminder_mgr.patch_reminder(reminder_id, patch_fields(patch), expected_version(if_match, patch.version))
+    return patch_result(result, "Reminder")
 
 @app.delete("/reminders/clear_all")
 def delete_all_reminders():
@@ -133,13 +489,173 @@ def delete_reminder(reminder_id: int):
     reminder_mgr.delete_reminder(reminder_id)
     return {"message": "Reminder deleted"}
 
-@app.get("/weather/history")
+@app.get("/calendar/month/{month}")
+def read_calendar_month(month: str):
+    try:
+        first = datetime.datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Month must be in YYYY-MM format")
+    last = first.replace(day=calendar.monthrange(first.year, first.month)[1])
+    start, end = parse_range(first.isoformat(), last.isoformat())
+    days = {}
+    for n in range(last.day):
+        days[(first + datetime.timedelta(days=n)).isoformat()] = {"tasks": [], "reminders": []}
+    # Bucket by the stored date text; rows whose epoch and text disagree are skipped, not a 500.
+    for t in task_mgr.get_tasks_due_between(start, end):
+        if t[3] in days:
+            days[t[3]]["tasks"].append(t)
+    for r in reminder_mgr.get_reminders_between(start, end):
+        day = (r[2] or "")[:10]
+        if day in days:
+            days[day]["reminders"].append(r)
+    return {"month": month, "days": days}
+
+@app.get("/timeline", response_model=TimelineResponse)
+def read_timeline(start: Optional[str] = Query(None, alias="from"), limit: int = Query(20, ge=1, le=200)):
+    if start is None:
+        start = datetime.date.today().isoformat()
+    start_at, _ = parse_range(start, None)
+    items = timeline_mgr.get_timeline(start_at, limit)
+    if not items:
+        return {"message": "Nothing on the timeline."}
+    return {"timeline": items}
+
+@app.get("/dashboard")
+def read_dashboard():
+    return {"dashboard": dashboard_mgr.get_summary()}
+
+@app.post("/dashboard/rebuild")
+def rebuild_dashboard():
+    drift = dashboard_mgr.rebuild()
+    return {"message": "Dashboard counters rebuilt.", "corrected": drift}
+
+@app.get("/search/fuzzy", response_model=FuzzySearchResponse)
+def fuzzy_search(q: str, limit: int = Query(20, ge=1, le=100)):
+    hits = fuzzy_index.search(q, limit)
+    if not hits:
+        return {"message": "No matches found."}
+    tasks = {t[0]: t for t in task_mgr.get_tasks_by_ids([ref_id for kind, ref_id, _, _ in hits if kind == "task"])}
+    results = []
+    for kind, ref_id, score, terms in hits:
+        if kind == "task":
+            label = tasks[ref_id][1] if ref_id in tasks else None
+        else:
+            note = notes_mgr.get_note(ref_id)
+            label = note["content"].splitlines()[0][:120] if note and note["content"] else None
+        results.append({"type": kind, "id": ref_id, "label": label, "score": score, "matched": terms})
+    return {"results": results}
+
+@app.get("/search/suggest", response_model=SuggestionList)
+def search_suggest(prefix: str, limit: int = Query(10, ge=1, le=50)):
+    return {"suggestions": suggest_index.suggest(prefix, limit)}
+
+ATTACHMENT_PARENTS = {"notes": "note", "tasks": "task"}
+
+@app.post("/{parent}/{ref_id}/attachments")
+async def upload_attachment(parent: str, ref_id: int, request: Request, filename: Optional[str] = None):
+    # The body is the raw file; it is streamed to disk, never held in memory.
+    kind = ATTACHMENT_PARENTS.get(parent)
+    if kind is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    # Everything that takes the DB lock or touches the disk runs in the threadpool, so a long
+    # transaction elsewhere cannot stall the event loop (SSE heartbeats, WebSockets).
+    if await run_in_threadpool(db.get_version, parent, ref_id) is None:
+        raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+    try:
+        tmp_path, digest, size = await attachment_store.save_stream(request.stream())
+    except AttachmentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    await run_in_threadpool(attachment_store.attach, kind, ref_id, tmp_path, digest, size, filename, content_type)
+    return {"message": "Attachment added", "hash": digest, "size": size}
+
+@app.get("/{parent}/{ref_id}/attachments", response_model=AttachmentListResponse)
+def read_attachments(parent: str, ref_id: int):
+    kind = ATTACHMENT_PARENTS.get(parent)
+    if kind is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    attachments = attachment_store.list_for(kind, ref_id)
+    if not attachments:
+        return {"message": "No attachments found."}
+    return {"attachments": attachments}
+
+@app.delete("/{parent}/{ref_id}/attachments/{digest}")
+def delete_attachment(parent: str, ref_id: int, digest: str):
+    kind = ATTACHMENT_PARENTS.get(parent)
+    if kind is None or not attachment_store.detach(kind, ref_id, digest):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return {"message": "Attachment removed"}
+
+@app.get("/attachments/{digest}")
+def download_attachment(
+    digest: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+):
+    attachment = attachment_store.get(digest) if HASH_RE.match(digest) else None
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    size = attachment["size"]
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and if_none_match.strip('"') == digest:
+        return Response(status_code=304, headers=headers)
+    try:
+        byte_range = parse_byte_range(range_header, size) if size else None
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    status = 200
+    start, end = 0, size - 1
+    if byte_range:
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        attachment_store.read_range(digest, start, end),
+        status_code=status,
+        media_type=attachment["content_type"] or "application/octet-stream",
+        headers=headers,
+    )
+
+@app.get("/sync", response_model=SyncResponse)
+def sync_changes(since: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000)):
+    result = change_log.changes_since(since, limit)
+    if result is None:
+        # Tombstones this client has not seen were compacted away, or its cursor is from another
+        # copy of the database; either way it must download everything again.
+        return {"reset": True, "latest": change_log.latest_seq()}
+    changes, has_more = result
+    latest = changes[-1]["seq"] if changes else since
+    return {"changes": changes, "latest": latest, "has_more": has_more}
+
+@app.post("/sync/compact")
+def compact_changes():
+    return {"removed": change_log.compact()}
+
+@app.get("/events")
+def change_events(entities: Optional[str] = None):
+    # entities=task,note limits the stream; default is every entity.
+    wanted = [e.strip() for e in entities.split(",") if e.strip()] if entities else None
+    return StreamingResponse(
+        event_stream.stream(wanted),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/duplicates", response_model=DuplicateReportResponse)
+def read_duplicates(kind: Optional[str] = Query(None, pattern="^(task|note)$")):
+    report = duplicate_detector.report(kind)
+    if not any(report.values()):
+        return {"message": "No duplicates found."}
+    return {"duplicates": report}
+
+@app.get("/weather/history", response_model=WeatherHistoryResponse)
 def weather_history():
     rows = weather_mgr.get_weather_history()
     logging.debug(f"Raw DB rows: {rows}")
     if not rows:
         return {"message": "Weather history is not available."}
-    history = [{"id": r[0], "city": r[1], "date": r[2], "weather": r[3]} for r in rows]
+    history = [{"id": r[0], "city": r[1], "date": r[2], "weather": r[3], "checked_at": r[4]} for r in rows]
     logging.debug(f"Formatted response: {history}")
     return {"history": history}
 
@@ -155,6 +671,134 @@ def clear_weather_history():
     weather_mgr.clear_weather_history()
     return {"message": "Weather history reset."}
 
+operations = OperationRegistry()
+for name, func in {
+    "tasks.list": read_tasks,
+    "tasks.next": read_next_tasks,
+    "tasks.create": create_task,
+    "tasks.update": update_task,
+    "tasks.patch": patch_task,
+    "tasks.complete": complete_task,
+    "tasks.reopen": reopen_task,
+    "tasks.delete": delete_task,
+    "tasks.clear": delete_all_tasks,
+    "tasks.tags.add": add_task_tags,
+    "tasks.tags.remove": remove_task_tag,
+    "notes.list": read_notes,
+    "notes.get": read_note,
+    "notes.search": search_notes,
+    "notes.create": create_note,
+    "notes.update": update_note,
+    "notes.patch": patch_note,
+    "notes.delete": delete_note,
+    "notes.clear": delete_all_notes,
+    "reminders.list": read_reminders,
+    "reminders.today": read_todays_reminders,
+    "reminders.create": create_reminder,
+    "reminders.update": update_reminder,
+    "reminders.patch": patch_reminder,
+    "reminders.delete": delete_reminder,
+    "reminders.clear": delete_all_reminders,
+    "weather.get": get_weather,
+    "weather.history": weather_history,
+    "weather.clear": clear_weather_history,
+    "calendar.month": read_calendar_month,
+    "timeline": read_timeline,
+    "dashboard": read_dashboard,
+    "search.fuzzy": fuzzy_search,
+    "search.suggest": search_suggest,
+}.items():
+    operations.register(name, func)
+
+class BatchOperation(BaseModel):
+    op: str
+    params: dict = {}
+
+class Batch(BaseModel):
+    operations: List[BatchOperation]
+
+BATCH_PREFIXES = ("tasks.", "notes.", "reminders.")
+
+@app.post("/batch")
+def run_batch(batch: Batch):
+    # All operations share one transaction: the first failure rolls every earlier one back.
+    if not 1 <= len(batch.operations) <= 100:
+        raise HTTPException(status_code=400, detail="A batch takes between 1 and 100 operations")
+    results = []
+    try:
+        with db.transaction():
+            for item in batch.operations:
+                if not item.op.startswith(BATCH_PREFIXES):
+                    raise OperationError(400, f"Operation not allowed in a batch: {item.op}")
+                results.append({"ok": True, "result": operations.call(item.op, item.params)})
+    except OperationError as e:
+        results.append({"ok": False, **e.as_dict()})
+        return JSONResponse(
+            status_code=e.status,
+            content={"committed": False, "failed_index": len(results) - 1, "results": results},
+        )
+    return {"committed": True, "results": results}
+
+@app.websocket("/ws")
+async def websocket_api(websocket: WebSocket):
+    """One connection for every operation plus pushed changes.
+
+    Client sends {"id", "op", "params"}; the reply is {"id", "ok": true, "result"} or
+    {"id", "ok": false, "status", "error"}. Requests run concurrently, so replies can arrive
+    out of order and are matched by id. Committed changes arrive as {"event": {...}}.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue(ws_config.get("queue_size", 256))
+    pending = set()
+
+    def push(event):
+        # Called after commit from whichever thread wrote; drop pushes for a client that is not reading.
+        def offer():
+            if outbox.full():
+                return
+            outbox.put_nowait({"event": jsonable_encoder(event)})
+        loop.call_soon_threadsafe(offer)
+
+    async def handle(message):
+        reply = {"id": message.get("id")}
+        try:
+            result = await run_in_threadpool(operations.call, message.get("op"), message.get("params"))
+            reply.update(ok=True, result=result)
+        except OperationError as e:
+            reply.update(ok=False, **e.as_dict())
+        except Exception as e:
+            logging.exception(f"WebSocket operation {message.get('op')} failed")
+            reply.update(ok=False, status=500, error=str(e))
+        await outbox.put(reply)
+
+    async def sender():
+        while True:
+            await websocket.send_json(await outbox.get())
+
+    bus.subscribe(push, after_commit=True)
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await outbox.put({"id": None, "ok": False, "status": 400, "error": "Messages must be JSON objects"})
+                continue
+            if not isinstance(message, dict):
+                await outbox.put({"id": None, "ok": False, "status": 400, "error": "Messages must be JSON objects"})
+                continue
+            task = asyncio.create_task(handle(message))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        bus.unsubscribe(push)
+        send_task.cancel()
+        for task in pending:
+            task.cancel()
+
 @app.get("/")
 def welcome():
     return {"message": "Welcome to Smart Life Manager API"}
@@ -1,21 +1,190 @@
 from db import DBHelper
+import html
+import re
+import zlib
+
+NOTE_FIELDS = ("id", "content", "version")
+
+# Sentinels wrapped around matches by snippet(); swapped for <mark> after the snippet is HTML-escaped.
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+def fts_query(text):
+    """Turn user input into a safe FTS5 query: quoted phrases stay phrases, a trailing * keeps prefix search,
+    everything else becomes individually quoted terms that must all match."""
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase.strip():
+            parts.append('"' + phrase.strip() + '"')
+        elif word:
+            prefix = word.endswith("*")
+            term = word.rstrip("*").replace('"', "")
+            if term:
+                parts.append('"' + term + '"' + ("*" if prefix else ""))
+    return " ".join(parts)
+
+def encode_content(content, threshold):
+    """Storage form of a note body: (value, compressed flag). Bodies above threshold bytes are zlib-compressed
+    when that actually saves space."""
+    data = content.encode("utf-8")
+    if threshold and len(data) > threshold:
+        packed = zlib.compress(data, 6)
+        if len(packed) < len(data):
+            return packed, 1
+    return content, 0
+
+def decode_content(value, compressed):
+    return zlib.decompress(value).decode("utf-8") if compressed else value
+
+def make_preview(content, length):
+    return content if len(content) <= length else content[:length].rstrip() + "…"
 
 class NotesManager:
-    def __init__(self, db: DBHelper):
+    def __init__(self, db: DBHelper, bus=None, compress_threshold=4096, preview_chars=200, revisions=None):
         self.db = db
+        self.bus = bus
+        self.revisions = revisions
+        self.compress_threshold = compress_threshold
+        self.preview_chars = preview_chars
+
+    def _storage_fields(self, content):
+        stored, compressed = encode_content(content, self.compress_threshold)
+        return {"content": stored, "compressed": compressed, "preview": make_preview(content, self.preview_chars)}
+
+    def _publish(self, op, note_id=None):
+        if self.bus:
+            row = self.get_note(note_id) if op in ("create", "update") else None
+            self.bus.publish("note", op, note_id, row)
 
     def add_note(self, content):
-        self.db.execute("INSERT INTO notes (content) VALUES (?)", (content,), commit=True)
+        fields = self._storage_fields(content)
+        with self.db.transaction():
+            c = self.db.execute(
+                "INSERT INTO notes (content, compressed, preview) VALUES (?, ?, ?)",
+                (fields["content"], fields["compressed"], fields["preview"]),
+            )
+            if self.revisions:
+                self.revisions.record(c.lastrowid, content)
+            self._publish("create", c.lastrowid)
+        return c.lastrowid
+
+    def get_note(self, note_id):
+        c = self.db.execute("SELECT id, content, compressed, version FROM notes WHERE id=?", (note_id,))
+        row = c.fetchone() if c else None
+        if row is None:
+            return None
+        note_id, content, compressed, version = row
+        return dict(zip(NOTE_FIELDS, (note_id, decode_content(content, compressed), version)))
+
+    def get_notes(self, preview=False):
+        """All notes as (id, content, version). With preview=True the stored preview stands in for the body,
+        so nothing is decompressed."""
+        if preview:
+            c = self.db.execute("SELECT id, preview, version FROM notes")
+            return c.fetchall() if c else []
+        c = self.db.execute("SELECT id, content, compressed, version FROM notes")
+        return [(i, decode_content(content, compressed), v) for i, content, compressed, v in (c.fetchall() if c else [])]
+
+    def get_previews(self, note_ids):
+        note_ids = list(note_ids)
+        if not note_ids:
+            return {}
+        c = self.db.execute(f"SELECT id, preview FROM notes WHERE id IN ({','.join('?' * len(note_ids))})", tuple(note_ids))
+        return dict(c.fetchall()) if c else {}
+
+    def compress_existing(self):
+        """Bring rows written before compression (or with a larger threshold) into the current storage form."""
+        c = self.db.execute(
+            "SELECT id, content FROM notes WHERE compressed = 0 AND (preview IS NULL OR length(CAST(content AS BLOB)) > ?)",
+            (self.compress_threshold,),
+        )
+        rows = c.fetchall() if c else []
+        with self.db.transaction():
+            for note_id, content in rows:
+                fields = self._storage_fields(content or "")
+                self.db.execute(
+                    "UPDATE notes SET content=?, compressed=?, preview=? WHERE id=?",
+                    (fields["content"], fields["compressed"], fields["preview"], note_id),
+                )
+        return len(rows)
+
+    def search_notes(self, query, limit=20, offset=0):
+        """BM25-ranked matches with highlighted snippets. Returns (rows, has_more)."""
+        match = fts_query(query)
+        if not match:
+            return [], False
+        c = self.db.execute(
+            "SELECT n.id, snippet(notes_fts, 0, ?, ?, '…', 12), bm25(notes_fts) AS rank, n.version "
+            "FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+            (MATCH_START, MATCH_END, match, limit + 1, offset),
+        )
+        rows = c.fetchall() if c else []
+        results = [
+            {
+                "id": note_id,
+                "snippet": html.escape(snippet).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>"),
+                "rank": rank,
+                "version": version,
+            }
+            for note_id, snippet, rank, version in rows[:limit]
+        ]
+        return results, len(rows) > limit
+
+    def _content_changed(self, note_id, content, previous):
+        # notes_fts follows the row through the triggers installed by ensure_notes_fts.
+        # Saving the same text again is not a new revision.
+        if self.revisions and previous is not None and previous != content:
+            self.revisions.record(note_id, content, previous)
+
+    def _current_content(self, note_id):
+        if not self.revisions:
+            return None
+        note = self.get_note(note_id)
+        return note["content"] if note else None
 
-    def get_notes(self):
-        c = self.db.execute("SELECT id, content FROM notes")
-        return c.fetchall() if c else []
+    def edit_note(self, note_id, content, expected_version=None):
+        """Returns the new version, or None if the note does not exist; raises VersionConflictError on a stale version."""
+        fields = self._storage_fields(content)
+        query = "UPDATE notes SET content=?, compressed=?, preview=?, version = version + 1 WHERE id=?"
+        params = (fields["content"], fields["compressed"], fields["preview"], note_id)
+        if expected_version is not None:
+            query += " AND version=?"
+            params += (expected_version,)
+        with self.db.transaction():
+            previous = self._current_content(note_id)
+            c = self.db.execute(query, params)
+            if not c.rowcount:
+                self.db.check_version("notes", note_id, expected_version)
+                return None
+            self._content_changed(note_id, content, previous)
+            self._publish("update", note_id)
+            return self.db.get_version("notes", note_id)
 
-    def edit_note(self, note_id, content):
-        self.db.execute("UPDATE notes SET content=? WHERE id=?", (content, note_id), commit=True)
+    def patch_note(self, note_id, fields, expected_version=None):
+        """Write only the supplied columns. Returns None if the note is missing, else (changed, version)."""
+        content = fields.get("content")
+        if content is not None:
+            fields = {**fields, **self._storage_fields(content)}
+        with self.db.transaction():
+            if self.db.check_version("notes", note_id, expected_version) is None:
+                return None
+            previous = self._current_content(note_id) if content is not None else None
+            changed = bool(self.db.update_changed("notes", note_id, fields, expected_version))
+            if changed and content is not None:
+                self._content_changed(note_id, content, previous)
+                self._publish("update", note_id)
+            return changed, self.db.get_version("notes", note_id)
 
     def delete_note(self, note_id):
-        self.db.execute("DELETE FROM notes WHERE id=?", (note_id,), commit=True)
+        with self.db.transaction():
+            if self.db.execute("DELETE FROM notes WHERE id=?", (note_id,)).rowcount:
+                if self.revisions:
+                    self.revisions.delete(note_id)
+                self._publish("delete", note_id)
 
     def delete_all_notes(self):
-        self.db.execute("DELETE FROM notes", commit=True)
\ No newline at end of file
+        with self.db.transaction():
+            self.db.execute("DELETE FROM notes")
+            if self.revisions:
+                self.revisions.delete()
+            self._publish("clear")
@@ -0,0 +1,63 @@
+import inspect
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from db import VersionConflictError
+
+class OperationError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.extra = extra
+
+    def as_dict(self):
+        return {"status": self.status, "error": self.detail, **self.extra}
+
+class OperationRegistry:
+    """Named operations over the REST endpoint functions, for transports that are not plain HTTP.
+
+    Each operation reuses an endpoint unchanged: its signature becomes a pydantic model, so query
+    constraints (ge/le/pattern) and body models validate exactly as they do over HTTP. Body fields
+    may be nested under the body parameter's name or given inline next to the path parameters.
+    """
+
+    def __init__(self):
+        self.operations = {}
+
+    def register(self, name, func):
+        fields, bodies = {}, set()
+        for param in inspect.signature(func).parameters.values():
+            default = ... if param.default is inspect.Parameter.empty else param.default
+            if inspect.isclass(param.annotation) and issubclass(param.annotation, BaseModel):
+                bodies.add(param.name)
+            fields[param.name] = (param.annotation, default)
+        params_model = create_model(
+            f"{func.__name__}_params", __config__=ConfigDict(populate_by_name=True, extra="ignore"), **fields
+        )
+        self.operations[name] = (func, params_model, bodies)
+
+    def call(self, name, params=None):
+        """Run one operation; returns its JSON-ready result or raises OperationError."""
+        if name not in self.operations:
+            raise OperationError(404, f"Unknown operation: {name}")
+        func, params_model, bodies = self.operations[name]
+        params = dict(params or {})
+        for body in bodies:
+            if not isinstance(params.get(body), dict):
+                params[body] = dict(params)
+        try:
+            bound = params_model.model_validate(params)
+        except ValidationError as e:
+            raise OperationError(422, jsonable_encoder(e.errors(include_url=False, include_context=False)))
+        try:
+            result = func(**{field: getattr(bound, field) for field in params_model.model_fields})
+        except HTTPException as e:
+            raise OperationError(e.status_code, e.detail)
+        except VersionConflictError as e:
+            raise OperationError(409, str(e), current_version=e.current_version)
+        except ValidationError as e:
+            raise OperationError(422, jsonable_encoder(e.errors(include_url=False, include_context=False)))
+        except ValueError as e:
+            raise OperationError(400, str(e))
+        return jsonable_encoder(result)
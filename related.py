@@ -0,0 +1,115 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+def term_counts(text):
+    return Counter(w.lower() for w in TOKEN_RE.findall(text or ""))
+
+class RelatedNotesIndex:
+    """In-memory sparse TF-IDF over note bodies for "related notes" suggestions.
+
+    Each note is a sparse vector of log-scaled term frequencies; an inverted index maps each
+    term to the notes containing it. A query is a sparse dot product that only touches the
+    posting lists of the note's own strongest terms, so cost follows the overlap rather than
+    the collection size. Vector norms use the idf at indexing time and are refreshed in one
+    pass once the collection has grown or shrunk by `renorm_drift`.
+    """
+
+    QUERY_TERMS = 32
+    MIN_DOCS_FOR_MAX_DF = 50
+
+    def __init__(self, max_df=0.5, renorm_drift=0.1):
+        self.lock = threading.Lock()
+        self.vectors = {}
+        self.postings = {}
+        self.norms = {}
+        self.max_df = max_df
+        self.renorm_drift = renorm_drift
+        self.normed_at = 0
+
+    def _idf(self, term):
+        return math.log((1 + len(self.vectors)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def _norm(self, vector):
+        return math.sqrt(sum((w * self._idf(t)) ** 2 for t, w in vector.items())) or 1.0
+
+    def _maybe_renorm(self):
+        n = len(self.vectors)
+        if abs(n - self.normed_at) > self.renorm_drift * max(self.normed_at, 1):
+            self.norms = {note_id: self._norm(v) for note_id, v in self.vectors.items()}
+            self.normed_at = n
+
+    def _remove(self, note_id):
+        vector = self.vectors.pop(note_id, None)
+        self.norms.pop(note_id, None)
+        for term in vector or ():
+            posting = self.postings[term]
+            posting.pop(note_id, None)
+            if not posting:
+                del self.postings[term]
+
+    def _insert(self, note_id, text):
+        self._remove(note_id)
+        vector = {t: 1 + math.log(c) for t, c in term_counts(text).items()}
+        self.vectors[note_id] = vector
+        for term, weight in vector.items():
+            self.postings.setdefault(term, {})[note_id] = weight
+        return vector
+
+    def put(self, note_id, text):
+        with self.lock:
+            self.norms[note_id] = self._norm(self._insert(note_id, text))
+            self._maybe_renorm()
+
+    def remove(self, note_id):
+        with self.lock:
+            self._remove(note_id)
+            self._maybe_renorm()
+
+    def clear(self):
+        with self.lock:
+            self.vectors, self.postings, self.norms, self.normed_at = {}, {}, {}, 0
+
+    def load(self, notes):
+        with self.lock:
+            self.vectors, self.postings = {}, {}
+            for note_id, text in notes:
+                self._insert(note_id, text)
+            self.norms = {note_id: self._norm(v) for note_id, v in self.vectors.items()}
+            self.normed_at = len(self.vectors)
+
+    def handle(self, event):
+        if event["entity"] != "note":
+            return
+        if event["op"] in ("create", "update") and event["row"]:
+            self.put(event["id"], event["row"]["content"])
+        elif event["op"] == "delete":
+            self.remove(event["id"])
+        elif event["op"] == "clear":
+            self.clear()
+
+    def related(self, note_id, k=5):
+        """Top-k (note_id, cosine score) for a note, best first; None if the note is not indexed."""
+        with self.lock:
+            vector = self.vectors.get(note_id)
+            if vector is None:
+                return None
+            # Terms in most notes add little but cost the longest posting walks; only prune them
+            # once the collection is big enough for document frequency to mean something.
+            n = len(self.vectors)
+            limit = self.max_df * n if n >= self.MIN_DOCS_FOR_MAX_DF else n
+            weighted = [(w * self._idf(t), t) for t, w in vector.items() if len(self.postings[t]) <= limit]
+            query = heapq.nlargest(self.QUERY_TERMS, weighted)
+            scores = {}
+            for qw, term in query:
+                idf = self._idf(term)
+                for other, w in self.postings[term].items():
+                    if other != note_id:
+                        scores[other] = scores.get(other, 0.0) + qw * w * idf
+            qnorm = self.norms.get(note_id) or 1.0
+            best = heapq.nlargest(k, ((s / (qnorm * self.norms.get(o, 1.0)), o) for o, s in scores.items()))
+            return [(o, round(s, 4)) for s, o in best]
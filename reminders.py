@@ -1,25 +1,85 @@
 from db import DBHelper
+from utils import epoch_range, to_epoch
+
+REMINDER_FIELDS = ("id", "content", "date", "remind_at", "version")
 
 class ReminderManager:
-    def __init__(self, db: DBHelper):
+    def __init__(self, db: DBHelper, bus=None):
         self.db = db
+        self.bus = bus
+
+    def _publish(self, op, reminder_id=None):
+        if self.bus:
+            row = self.get_reminder(reminder_id) if op in ("create", "update") else None
+            self.bus.publish("reminder", op, reminder_id, row)
 
     def add_reminder(self, content, date):
-        self.db.execute("INSERT INTO reminders (content, date) VALUES (?, ?)", (content, date), commit=True)
+        with self.db.transaction():
+            c = self.db.execute("INSERT INTO reminders (content, date, remind_at) VALUES (?, ?, ?)", (content, date, to_epoch(date)))
+            self._publish("create", c.lastrowid)
+        return c.lastrowid
+
+    def get_reminder(self, reminder_id):
+        c = self.db.execute(f"SELECT {', '.join(REMINDER_FIELDS)} FROM reminders WHERE id=?", (reminder_id,))
+        row = c.fetchone() if c else None
+        return dict(zip(REMINDER_FIELDS, row)) if row else None
 
     def get_all_reminders(self):
-        c = self.db.execute("SELECT id, content, date FROM reminders ORDER BY date")
+        c = self.db.execute("SELECT id, content, date, remind_at, version FROM reminders ORDER BY remind_at")
+        return c.fetchall() if c else []
+
+    def get_reminders_between(self, start=None, end=None):
+        # Half-open [start, end) epoch range, either bound optional; served by idx_reminders_remind_at.
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("remind_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("remind_at < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else " WHERE remind_at IS NOT NULL"
+        c = self.db.execute(f"SELECT id, content, date, remind_at, version FROM reminders{where} ORDER BY remind_at", tuple(params))
         return c.fetchall() if c else []
 
     def get_todays_reminders(self, today_date):
-        c = self.db.execute("SELECT id, content FROM reminders WHERE date=?", (today_date,))
+        start, end = epoch_range(today_date, today_date)
+        c = self.db.execute("SELECT id, content FROM reminders WHERE remind_at >= ? AND remind_at < ? ORDER BY remind_at", (start, end))
         return c.fetchall() if c else []
 
-    def edit_reminder(self, reminder_id, content, date):
-        self.db.execute("UPDATE reminders SET content=?, date=? WHERE id=?", (content, date, reminder_id), commit=True)
+    def edit_reminder(self, reminder_id, content, date, expected_version=None):
+        """Returns the new version, or None if the reminder does not exist; raises VersionConflictError on a stale version."""
+        query = "UPDATE reminders SET content=?, date=?, remind_at=?, version = version + 1 WHERE id=?"
+        params = (content, date, to_epoch(date), reminder_id)
+        if expected_version is not None:
+            query += " AND version=?"
+            params += (expected_version,)
+        with self.db.transaction():
+            c = self.db.execute(query, params)
+            if not c.rowcount:
+                self.db.check_version("reminders", reminder_id, expected_version)
+                return None
+            self._publish("update", reminder_id)
+            return self.db.get_version("reminders", reminder_id)
+
+    def patch_reminder(self, reminder_id, fields, expected_version=None):
+        """Write only the supplied columns. Returns None if the reminder is missing, else (changed, version)."""
+        fields = dict(fields)
+        if "date" in fields:
+            fields["remind_at"] = to_epoch(fields["date"])
+        with self.db.transaction():
+            if self.db.check_version("reminders", reminder_id, expected_version) is None:
+                return None
+            changed = bool(self.db.update_changed("reminders", reminder_id, fields, expected_version))
+            if changed:
+                self._publish("update", reminder_id)
+            return changed, self.db.get_version("reminders", reminder_id)
 
     def delete_reminder(self, reminder_id):
-        self.db.execute("DELETE FROM reminders WHERE id=?", (reminder_id,), commit=True)
+        with self.db.transaction():
+            if self.db.execute("DELETE FROM reminders WHERE id=?", (reminder_id,)).rowcount:
+                self._publish("delete", reminder_id)
 
     def delete_all_reminders(self):
-        self.db.execute("DELETE FROM reminders", commit=True)
\ No newline at end of file
+        with self.db.transaction():
+            self.db.execute("DELETE FROM reminders")
+            self._publish("clear")
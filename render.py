@@ -0,0 +1,105 @@
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+
+SAFE_LINK = re.compile(r"^(https?:|mailto:)", re.IGNORECASE)
+
+def _inline(text):
+    """Escape first, then apply inline markup, so note content can never inject tags."""
+    parts = re.split(r"(`[^`]+`)", text)
+    out = []
+    for part in parts:
+        if len(part) > 1 and part.startswith("`") and part.endswith("`"):
+            out.append(f"<code>{html.escape(part[1:-1])}</code>")
+            continue
+        s = html.escape(part, quote=True)
+        s = re.sub(r"\*\*(.+?)\*\*|__(.+?)__", lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", s)
+        s = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\w)|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)",
+                   lambda m: f"<em>{m.group(1) or m.group(2)}</em>", s)
+        s = re.sub(r"\[([^\]]+)\]\(([^)\s]+)\)",
+                   lambda m: f'<a href="{m.group(2)}" rel="nofollow noopener">{m.group(1)}</a>'
+                   if SAFE_LINK.match(html.unescape(m.group(2))) else m.group(0), s)
+        out.append(s)
+    return "".join(out)
+
+def render_markdown(text):
+    """Render the common Markdown subset used in notes: headings, paragraphs, lists, quotes,
+    fenced code, rules and inline emphasis/code/links. Raw HTML is always escaped."""
+    out, para, list_tag, code = [], [], None, None
+
+    def flush():
+        nonlocal list_tag
+        if para:
+            out.append(f"<p>{_inline(' '.join(para))}</p>")
+            para.clear()
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in (text or "").splitlines():
+        if code is not None:
+            if line.strip().startswith("```"):
+                out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+                code = None
+            else:
+                code.append(line)
+            continue
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            flush()
+            code = []
+        elif not stripped:
+            flush()
+        elif re.match(r"^(\*\s*){3,}$|^(-\s*){3,}$", stripped):
+            flush()
+            out.append("<hr>")
+        elif m := re.match(r"^(#{1,6})\s+(.*)$", stripped):
+            flush()
+            level = len(m.group(1))
+            out.append(f"<h{level}>{_inline(m.group(2).rstrip('#').strip())}</h{level}>")
+        elif m := re.match(r"^([-*+]|\d+[.)])\s+(.*)$", stripped):
+            tag = "ol" if m.group(1)[0].isdigit() else "ul"
+            if para or list_tag != tag:
+                flush()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{_inline(m.group(2))}</li>")
+        elif stripped.startswith(">"):
+            flush()
+            out.append(f"<blockquote>{_inline(stripped.lstrip('>').strip())}</blockquote>")
+        else:
+            if list_tag:
+                flush()
+            para.append(stripped)
+    if code is not None:
+        out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+    flush()
+    return "\n".join(out)
+
+class RenderCache:
+    """Bounded LRU of rendered HTML keyed by the SHA-256 of the source text.
+
+    Edits change the hash, so stale entries are never served; they just age out.
+    """
+
+    def __init__(self, max_entries=512, render=render_markdown):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.render_fn = render
+
+    def render(self, text):
+        key = hashlib.sha256((text or "").encode("utf-8")).digest()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        rendered = self.render_fn(text)
+        with self.lock:
+            self.entries[key] = rendered
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return rendered
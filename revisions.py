@@ -0,0 +1,86 @@
+import difflib
+import json
+import time
+import zlib
+from db import DBHelper
+
+def make_delta(old, new):
+    """Line-level delta turning old into new: ["c", start, end] copies old lines, ["i", text] inserts text."""
+    a, b = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif j2 > j1:
+            ops.append(["i", "".join(b[j1:j2])])
+    return ops
+
+def apply_delta(old, ops):
+    a = old.splitlines(keepends=True)
+    return "".join("".join(a[op[1]:op[2]]) if op[0] == "c" else op[1] for op in ops)
+
+class RevisionStore:
+    """Note history as forward deltas with a full snapshot every `snapshot_every` revisions.
+
+    Revision 1 of a note is always a snapshot, so rebuilding any revision reads one snapshot and
+    replays fewer than `snapshot_every` deltas.
+    """
+
+    def __init__(self, db: DBHelper, snapshot_every=10):
+        self.db = db
+        self.snapshot_every = max(1, snapshot_every)
+
+    def latest_rev(self, note_id):
+        c = self.db.execute("SELECT MAX(rev) FROM note_revisions WHERE note_id=?", (note_id,))
+        row = c.fetchone() if c else None
+        return row[0] if row and row[0] else 0
+
+    def _store(self, note_id, rev, kind, payload):
+        data = zlib.compress(payload.encode("utf-8"))
+        self.db.execute(
+            "INSERT INTO note_revisions (note_id, rev, kind, data, size, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (note_id, rev, kind, data, len(data), int(time.time())),
+        )
+
+    def record(self, note_id, content, previous=None):
+        """Append content as the next revision. `previous` is the content it replaces; notes that predate
+        revision tracking get it stored as their first snapshot."""
+        with self.db.transaction():
+            rev = self.latest_rev(note_id)
+            if rev == 0 and previous is not None:
+                self._store(note_id, 1, "full", previous)
+                rev = 1
+            rev += 1
+            if (rev - 1) % self.snapshot_every == 0 or previous is None:
+                self._store(note_id, rev, "full", content)
+            else:
+                self._store(note_id, rev, "delta", json.dumps(make_delta(previous, content), separators=(",", ":")))
+            return rev
+
+    def list(self, note_id):
+        c = self.db.execute(
+            "SELECT rev, kind, size, created_at FROM note_revisions WHERE note_id=? ORDER BY rev DESC", (note_id,)
+        )
+        return [dict(zip(("rev", "kind", "size", "created_at"), r)) for r in (c.fetchall() if c else [])]
+
+    def get(self, note_id, rev):
+        """Rebuild a revision from the nearest snapshot at or before it. Returns None if it does not exist."""
+        c = self.db.execute(
+            "SELECT rev, kind, data FROM note_revisions WHERE note_id=? AND rev <= ? AND rev >= "
+            "(SELECT MAX(rev) FROM note_revisions WHERE note_id=? AND rev <= ? AND kind='full') ORDER BY rev",
+            (note_id, rev, note_id, rev),
+        )
+        rows = c.fetchall() if c else []
+        if not rows or rows[-1][0] != rev:
+            return None
+        content = None
+        for _, kind, data in rows:
+            payload = zlib.decompress(data).decode("utf-8")
+            content = payload if kind == "full" else apply_delta(content, json.loads(payload))
+        return content
+
+    def delete(self, note_id=None):
+        if note_id is None:
+            self.db.execute("DELETE FROM note_revisions")
+        else:
+            self.db.execute("DELETE FROM note_revisions WHERE note_id=?", (note_id,))
@@ -0,0 +1,196 @@
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Union
+from fastapi.datastructures import Default
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+# With orjson, every endpoint renders through it; routes with a response model hand it
+# pydantic-serialized data and skip jsonable_encoder entirely. Without it, keep FastAPI's
+# default placeholder so response-model routes still take pydantic's direct-to-bytes path.
+DEFAULT_RESPONSE_CLASS = FastJSONResponse if orjson is not None else Default(JSONResponse)
+
+# One row of TASK_COLUMNS: id, title, description, due_date, priority, due_at, status, completed_at, version.
+TaskRow = Tuple[int, Optional[str], Optional[str], Optional[str], Optional[int], Optional[int], Optional[str], Optional[int], Optional[int]]
+
+# A tasks_archive row: TASK_COLUMNS followed by archived_at.
+ArchivedTaskRow = Tuple[int, Optional[str], Optional[str], Optional[str], Optional[int], Optional[int], Optional[str], Optional[int], Optional[int], Optional[int]]
+# TASK_COLUMNS followed by blocked_count.
+BlockedTaskRow = Tuple[int, Optional[str], Optional[str], Optional[str], Optional[int], Optional[int], Optional[str], Optional[int], Optional[int], int]
+# id, content (or its stored preview / rendered HTML), version.
+NoteRow = Tuple[int, Optional[str], int]
+# id, content, date, remind_at, version.
+ReminderRow = Tuple[int, Optional[str], Optional[str], Optional[int], int]
+
+class Message(BaseModel):
+    message: str
+
+class TaskList(BaseModel):
+    tasks: List[TaskRow]
+
+class ArchivedTaskList(BaseModel):
+    tasks: List[ArchivedTaskRow]
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+class TagList(BaseModel):
+    tags: List[TagCount]
+
+class TaskTagList(BaseModel):
+    tags: List[str]
+
+class Blocker(BaseModel):
+    task: BlockedTaskRow
+    depth: int
+
+class BlockerList(BaseModel):
+    blockers: List[Blocker]
+    dependents: List[BlockedTaskRow]
+
+class NoteList(BaseModel):
+    notes: List[NoteRow]
+
+class NoteSearchHit(BaseModel):
+    id: int
+    snippet: str
+    rank: float
+    version: int
+
+class NoteSearchResults(BaseModel):
+    results: List[NoteSearchHit]
+    next_offset: Optional[int]
+
+class RelatedNote(BaseModel):
+    id: int
+    score: float
+    preview: Optional[str]
+
+class RelatedNoteList(BaseModel):
+    related: List[RelatedNote]
+
+class Revision(BaseModel):
+    rev: int
+    kind: str
+    size: int
+    created_at: int
+
+class RevisionList(BaseModel):
+    revisions: List[Revision]
+
+class ReminderList(BaseModel):
+    reminders: List[ReminderRow]
+
+class TodaysReminderList(BaseModel):
+    today_reminders: List[Tuple[int, Optional[str]]]
+
+class TaskItem(BaseModel):
+    type: Literal["task"]
+    at: int
+    id: int
+    title: Optional[str]
+    description: Optional[str]
+    due_date: Optional[str]
+    priority: Optional[int]
+
+class ReminderItem(BaseModel):
+    type: Literal["reminder"]
+    at: int
+    id: int
+    content: Optional[str]
+    date: Optional[str]
+
+class WeatherItem(BaseModel):
+    type: Literal["weather"]
+    at: int
+    id: int
+    city: Optional[str]
+    weather: Optional[str]
+
+TimelineItem = Annotated[Union[TaskItem, ReminderItem, WeatherItem], Field(discriminator="type")]
+
+class Timeline(BaseModel):
+    timeline: List[TimelineItem]
+
+class FuzzyHit(BaseModel):
+    type: str
+    id: int
+    label: Optional[str]
+    score: float
+    matched: List[str]
+
+class FuzzyResults(BaseModel):
+    results: List[FuzzyHit]
+
+class Suggestion(BaseModel):
+    type: str
+    id: int
+    label: Optional[str]
+
+class SuggestionList(BaseModel):
+    suggestions: List[Suggestion]
+
+class Attachment(BaseModel):
+    hash: str
+    filename: Optional[str]
+    content_type: Optional[str]
+    size: int
+    created_at: int
+
+class AttachmentList(BaseModel):
+    attachments: List[Attachment]
+
+class DuplicateReport(BaseModel):
+    duplicates: Dict[str, List[List[int]]]
+
+class Change(BaseModel):
+    seq: int
+    entity: str
+    op: str
+    id: Optional[int]
+    row: Optional[Dict[str, Any]]
+
+class ChangePage(BaseModel):
+    changes: List[Change]
+    latest: int
+    has_more: bool
+
+class SyncReset(BaseModel):
+    reset: bool
+    latest: int
+
+class WeatherCheck(BaseModel):
+    id: int
+    city: Optional[str]
+    date: Optional[str]
+    weather: Optional[str]
+    checked_at: Optional[int]
+
+class WeatherHistory(BaseModel):
+    history: List[WeatherCheck]
+
+TaskListResponse = Union[TaskList, Message]
+ArchivedTaskListResponse = Union[ArchivedTaskList, Message]
+TagListResponse = Union[TagList, Message]
+NoteListResponse = Union[NoteList, Message]
+NoteSearchResponse = Union[NoteSearchResults, Message]
+RelatedNotesResponse = Union[RelatedNoteList, Message]
+RevisionListResponse = Union[RevisionList, Message]
+ReminderListResponse = Union[ReminderList, Message]
+TodaysRemindersResponse = Union[TodaysReminderList, Message]
+TimelineResponse = Union[Timeline, Message]
+FuzzySearchResponse = Union[FuzzyResults, Message]
+AttachmentListResponse = Union[AttachmentList, Message]
+DuplicateReportResponse = Union[DuplicateReport, Message]
+SyncResponse = Union[ChangePage, SyncReset]
+WeatherHistoryResponse = Union[WeatherHistory, Message]
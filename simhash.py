@@ -0,0 +1,149 @@
+import hashlib
+import re
+from collections import Counter
+from db import DBHelper
+from notes import decode_content
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def simhash(text):
+    """64-bit SimHash over words and word pairs, or None for text with no words."""
+    tokens = [t.lower() for t in TOKEN_RE.findall(text or "")]
+    features = Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+    if not features:
+        return None
+    totals = [0] * BITS
+    for feature, weight in features.items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(BITS):
+            totals[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(BITS) if totals[bit] > 0)
+
+def to_signed(value):
+    # SQLite integers are signed 64-bit.
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+def to_unsigned(value):
+    return value + (1 << BITS) if value < 0 else value
+
+def bands(fingerprint):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+def distance(a, b):
+    return bin(to_unsigned(a) ^ to_unsigned(b)).count("1")
+
+class DuplicateDetector:
+    """Near-duplicate lookup for notes and tasks by SimHash.
+
+    The fingerprint lives on the row (simhash column) and is split into four 16-bit bands in
+    simhash_bands. Two fingerprints within max_distance <= 3 bits must agree on at least one
+    whole band, so candidates come from a handful of exact band lookups and are then checked
+    by Hamming distance; no pairwise comparison over the table is needed.
+    """
+
+    SOURCES = {
+        "task": "SELECT id, title || ' ' || COALESCE(description, '') FROM tasks",
+        "note": "SELECT id, content, compressed FROM notes",
+    }
+    TABLES = {"task": "tasks", "note": "notes"}
+
+    def __init__(self, db: DBHelper, max_distance=3):
+        self.db = db
+        self.max_distance = min(max_distance, BANDS - 1)
+
+    @staticmethod
+    def text_of(kind, row):
+        if kind == "task":
+            return f"{row.get('title') or ''} {row.get('description') or ''}"
+        return row.get("content") or ""
+
+    def handle(self, event):
+        kind = event["entity"]
+        if kind not in self.SOURCES:
+            return
+        if event["op"] in ("create", "update") and event["row"]:
+            self.index(kind, event["id"], self.text_of(kind, event["row"]))
+        elif event["op"] == "delete":
+            self.db.execute("DELETE FROM simhash_bands WHERE kind=? AND ref_id=?", (kind, event["id"]))
+        elif event["op"] == "clear":
+            self.db.execute("DELETE FROM simhash_bands WHERE kind=?", (kind,))
+
+    def index(self, kind, ref_id, text):
+        fingerprint = simhash(text)
+        stored = to_signed(fingerprint) if fingerprint is not None else None
+        table = self.TABLES[kind]
+        c = self.db.execute(f"SELECT simhash FROM {table} WHERE id=?", (ref_id,))
+        row = c.fetchone() if c else None
+        if row is not None and row[0] == stored and stored is not None:
+            return
+        with self.db.transaction():
+            self.db.execute(f"UPDATE {table} SET simhash=? WHERE id=?", (stored, ref_id))
+            self.db.execute("DELETE FROM simhash_bands WHERE kind=? AND ref_id=?", (kind, ref_id))
+            for band, value in bands(fingerprint) if fingerprint is not None else ():
+                self.db.execute(
+                    "INSERT INTO simhash_bands (kind, band, value, ref_id) VALUES (?, ?, ?, ?)", (kind, band, value, ref_id)
+                )
+
+    def index_missing(self):
+        """Fingerprint rows written before duplicate detection existed."""
+        with self.db.transaction():
+            for kind, query in self.SOURCES.items():
+                for row in self.db.execute(f"{query} WHERE simhash IS NULL").fetchall():
+                    text = decode_content(row[1], row[2]) if kind == "note" else row[1]
+                    if simhash(text) is not None:
+                        self.index(kind, row[0], text)
+
+    def duplicates_of(self, kind, ref_id):
+        """[{"id", "distance"}] of other rows of the same kind close to this one, nearest first."""
+        c = self.db.execute(f"SELECT simhash FROM {self.TABLES[kind]} WHERE id=?", (ref_id,))
+        row = c.fetchone() if c else None
+        if row is None or row[0] is None:
+            return []
+        fingerprint = to_unsigned(row[0])
+        where = " OR ".join(["(band=? AND value=?)"] * BANDS)
+        params = [kind] + [x for pair in bands(fingerprint) for x in pair] + [ref_id]
+        c = self.db.execute(
+            f"SELECT DISTINCT t.id, t.simhash FROM simhash_bands b JOIN {self.TABLES[kind]} t ON t.id = b.ref_id "
+            f"WHERE b.kind=? AND ({where}) AND b.ref_id != ?",
+            tuple(params),
+        )
+        found = [(distance(fingerprint, other), other_id) for other_id, other in (c.fetchall() if c else [])]
+        return [{"id": i, "distance": d} for d, i in sorted(found) if d <= self.max_distance]
+
+    def report(self, kind=None):
+        """Clusters of near-duplicate ids per kind, built only from rows sharing a band bucket."""
+        kinds = [kind] if kind else list(self.SOURCES)
+        result = {}
+        for k in kinds:
+            c = self.db.execute(
+                f"SELECT b.band, b.value, b.ref_id, t.simhash FROM simhash_bands b JOIN {self.TABLES[k]} t ON t.id = b.ref_id "
+                "WHERE b.kind=? AND (b.band, b.value) IN "
+                "(SELECT band, value FROM simhash_bands WHERE kind=? GROUP BY band, value HAVING COUNT(*) > 1) "
+                "ORDER BY b.band, b.value",
+                (k, k),
+            )
+            buckets = {}
+            for band, value, ref_id, fingerprint in (c.fetchall() if c else []):
+                buckets.setdefault((band, value), []).append((ref_id, fingerprint))
+            parent = {}
+
+            def find(x):
+                while parent.setdefault(x, x) != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            for members in buckets.values():
+                for i, (a, fa) in enumerate(members):
+                    for b, fb in members[i + 1:]:
+                        if distance(fa, fb) <= self.max_distance:
+                            parent[find(a)] = find(b)
+            groups = {}
+            for x in parent:
+                groups.setdefault(find(x), []).append(x)
+            result[k] = sorted(sorted(g) for g in groups.values() if len(g) > 1)
+        return result
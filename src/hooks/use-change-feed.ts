@@ -0,0 +1,33 @@
+import { useCallback, useEffect, useRef } from 'react';
+import { ChangeEvent, subscribeToChanges } from '@/lib/api';
+
+// Applies changes pushed by the server (from this tab or any other) without refetching.
+// Returns isLive(): false while the stream is connecting or down, so callers know they must
+// refetch after their own writes instead of waiting for the change event.
+export function useChangeFeed(
+  entity: ChangeEvent['entity'],
+  onChange: (event: ChangeEvent) => void,
+  onResync: () => void,
+) {
+  // Keep the latest handlers without reconnecting the stream on every render.
+  const handlers = useRef({ onChange, onResync });
+  handlers.current = { onChange, onResync };
+  const live = useRef(false);
+
+  useEffect(() => {
+    const close = subscribeToChanges(
+      [entity],
+      (event) => handlers.current.onChange(event),
+      () => handlers.current.onResync(),
+      (isLive) => {
+        live.current = isLive;
+      },
+    );
+    return () => {
+      live.current = false;
+      close();
+    };
+  }, [entity]);
+
+  return useCallback(() => live.current, []);
+}
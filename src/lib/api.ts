@@ -9,13 +9,158 @@ export const api = axios.create({
   },
 });
 
+export interface ChangeEvent {
+  entity: 'task' | 'note' | 'reminder' | 'weather';
+  op: 'create' | 'update' | 'delete' | 'clear';
+  id: number | null;
+  row: Record<string, any> | null;
+}
+
+// Live change feed (Server-Sent Events). onResync fires when events may have been missed
+// (reconnect or the server dropping a slow client's backlog) and the caller should refetch.
+export const subscribeToChanges = (
+  entities: ChangeEvent['entity'][],
+  onChange: (event: ChangeEvent) => void,
+  onResync: () => void,
+  onStatus: (live: boolean) => void = () => {},
+) => {
+  const source = new EventSource(`${API_BASE_URL}/events?entities=${entities.join(',')}`);
+  let opened = false;
+  source.addEventListener('open', () => {
+    onStatus(true);
+    if (opened) onResync();
+    opened = true;
+  });
+  // Fires when the stream cannot connect or drops; EventSource keeps retrying by itself.
+  source.addEventListener('error', () => onStatus(false));
+  source.addEventListener('change', (e) => onChange(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener('resync', onResync);
+  return () => source.close();
+};
+
+// Delta sync: pass the last `latest` seen; a `reset: true` reply means download everything again.
+export const syncApi = {
+  since: (since: number, limit = 500) => api.get('/sync', { params: { since, limit } }),
+};
+
+// Multiplexed WebSocket client: one connection carries every operation, matched by request id;
+// pushed change events are left to useChangeFeed. Requests fail fast if the socket cannot be opened so callers can
+// fall back to plain HTTP.
+const createSocketClient = (url: string) => {
+  let socket: WebSocket | null = null;
+  let opening: Promise<WebSocket> | null = null;
+  let nextId = 1;
+  const pending = new Map<number, { resolve: (v: any) => void; reject: (e: Error) => void }>();
+
+  const connect = () => {
+    if (socket && socket.readyState === WebSocket.OPEN) return Promise.resolve(socket);
+    if (opening) return opening;
+    opening = new Promise<WebSocket>((resolve, reject) => {
+      const ws = new WebSocket(url);
+      ws.onopen = () => {
+        socket = ws;
+        opening = null;
+        resolve(ws);
+      };
+      ws.onerror = () => {
+        opening = null;
+        reject(Object.assign(new Error('WebSocket unavailable'), { unavailable: true }));
+      };
+      ws.onclose = () => {
+        socket = null;
+        pending.forEach(({ reject: fail }) => fail(new Error('WebSocket closed')));
+        pending.clear();
+      };
+      ws.onmessage = (message) => {
+        const data = JSON.parse(message.data);
+        const waiter = pending.get(data.id);
+        if (!waiter) return;
+        pending.delete(data.id);
+        if (data.ok) waiter.resolve(data.result);
+        else waiter.reject(Object.assign(new Error(`HTTP ${data.status}`), { status: data.status, detail: data.error }));
+      };
+    });
+    return opening;
+  };
+
+  return {
+    request: async (op: string, params: Record<string, any> = {}) => {
+      const ws = await connect();
+      const id = nextId++;
+      return new Promise<any>((resolve, reject) => {
+        pending.set(id, { resolve, reject });
+        ws.send(JSON.stringify({ id, op, params }));
+      });
+    },
+  };
+};
+
+export const socketApi = createSocketClient(`${API_BASE_URL.replace(/^http/, 'ws')}/ws`);
+
+// Maps a REST call onto its /ws operation, or null if it has none.
+export const toSocketOperation = (method: string, url: string, body?: Record<string, any>) => {
+  const [path] = url.split('?');
+  const routes: [string, RegExp, string, string?][] = [
+    ['DELETE', /^\/(tasks|notes|reminders)\/clear_all$/, 'clear'],
+    ['GET', /^\/(tasks|notes|reminders)$/, 'list'],
+    ['POST', /^\/(tasks|notes|reminders)$/, 'create'],
+    ['PUT', /^\/(tasks|notes|reminders)\/(\d+)$/, 'update'],
+    ['PATCH', /^\/(tasks|notes|reminders)\/(\d+)$/, 'patch'],
+    ['DELETE', /^\/(tasks|notes|reminders)\/(\d+)$/, 'delete'],
+    ['DELETE', /^\/weather\/history\/reset$/, 'clear', 'weather'],
+    ['GET', /^\/weather\/history$/, 'history', 'weather'],
+  ];
+  for (const [verb, pattern, action, fixed] of routes) {
+    const match = method.toUpperCase() === verb && path.match(pattern);
+    if (!match) continue;
+    const entity = fixed ?? match[1];
+    const params: Record<string, any> = { ...(body ?? {}) };
+    if (match[2]) params[`${entity.replace(/s$/, '')}_id`] = Number(match[2]);
+    return { op: `${entity}.${action}`, params };
+  }
+  return null;
+};
+
+// Atomic multi-step commands: every operation commits together or none does.
+export const batchApi = {
+  run: (operations: { op: string; params?: Record<string, any> }[]) => api.post('/batch', { operations }),
+};
+
+// Every write carries an Idempotency-Key, so a retry of the same request config (same key)
+// returns the original response instead of writing twice.
+api.interceptors.request.use((config) => {
+  const method = (config.method || 'get').toUpperCase();
+  if (['POST', 'PUT', 'PATCH', 'DELETE'].includes(method) && !config.headers['Idempotency-Key']) {
+    config.headers['Idempotency-Key'] = crypto.randomUUID();
+  }
+  return config;
+});
+
 // Tasks API
 export const tasksApi = {
   getAll: () => api.get('/tasks'),
+  getDueBetween: (dueFrom?: string, dueTo?: string) =>
+    api.get('/tasks', { params: { due_from: dueFrom, due_to: dueTo } }),
+  getNext: (k = 10) => api.get('/tasks/next', { params: { k } }),
+  complete: (id: number) => api.post(`/tasks/${id}/complete`),
+  reopen: (id: number) => api.post(`/tasks/${id}/reopen`),
+  getArchived: (limit = 50, offset = 0) => api.get('/tasks/archive', { params: { limit, offset } }),
+  getByTags: (tags: string[], match: 'all' | 'any' = 'all') =>
+    api.get('/tasks', { params: { tags: tags.join(','), match } }),
+  getTags: (id: number) => api.get(`/tasks/${id}/tags`),
+  addTags: (id: number, tags: string[]) => api.post(`/tasks/${id}/tags`, { tags }),
+  removeTag: (id: number, tag: string) => api.delete(`/tasks/${id}/tags/${encodeURIComponent(tag)}`),
+  allTags: () => api.get('/tags'),
+  getUnblocked: (limit = 50) => api.get('/tasks/unblocked', { params: { limit } }),
+  getBlockers: (id: number, depth?: number) => api.get(`/tasks/${id}/blockers`, { params: { depth } }),
+  addBlocker: (id: number, blockerId: number) => api.post(`/tasks/${id}/blockers`, { blocker_id: blockerId }),
+  removeBlocker: (id: number, blockerId: number) => api.delete(`/tasks/${id}/blockers/${blockerId}`),
   create: (data: { title: string; description: string; due_date: string; priority: number }) =>
     api.post('/tasks', data),
   update: (id: number, data: { title: string; description: string; due_date: string; priority: number }) =>
     api.put(`/tasks/${id}`, data),
+  patch: (id: number, data: Partial<{ title: string; description: string; due_date: string; priority: number; tags: string[] }>) =>
+    api.patch(`/tasks/${id}`, data),
   delete: (id: number) => api.delete(`/tasks/${id}`),
   clearAll: () => api.delete('/tasks/clear_all'),
 };
@@ -23,8 +168,17 @@ export const tasksApi = {
 // Notes API
 export const notesApi = {
   getAll: () => api.get('/notes'),
+  getPreviews: () => api.get('/notes', { params: { preview: true } }),
+  get: (id: number) => api.get(`/notes/${id}`),
+  getHtml: (id: number) => api.get(`/notes/${id}`, { params: { format: 'html' } }),
+  getHtmlPreviews: () => api.get('/notes', { params: { format: 'html' } }),
+  getRelated: (id: number, k = 5) => api.get(`/notes/${id}/related`, { params: { k } }),
+  getRevisions: (id: number) => api.get(`/notes/${id}/revisions`),
+  getRevision: (id: number, rev: number) => api.get(`/notes/${id}/revisions/${rev}`),
   create: (data: { content: string }) => api.post('/notes', data),
   update: (id: number, data: { content: string }) => api.put(`/notes/${id}`, data),
+  patch: (id: number, data: Partial<{ content: string }>) => api.patch(`/notes/${id}`, data),
+  search: (q: string, limit = 20, offset = 0) => api.get('/notes/search', { params: { q, limit, offset } }),
   delete: (id: number) => api.delete(`/notes/${id}`),
   clearAll: () => api.delete('/notes/clear_all'),
 };
@@ -33,12 +187,49 @@ export const notesApi = {
 export const remindersApi = {
   getAll: () => api.get('/reminders'),
   getToday: () => api.get('/reminders/today'),
+  getBetween: (from?: string, to?: string) => api.get('/reminders', { params: { from, to } }),
   create: (data: { content: string; date: string }) => api.post('/reminders', data),
   update: (id: number, data: { content: string; date: string }) => api.put(`/reminders/${id}`, data),
+  patch: (id: number, data: Partial<{ content: string; date: string }>) => api.patch(`/reminders/${id}`, data),
   delete: (id: number) => api.delete(`/reminders/${id}`),
   clearAll: () => api.delete('/reminders/clear_all'),
 };
 
+// Calendar API
+export const calendarApi = {
+  getMonth: (month: string) => api.get(`/calendar/month/${month}`),
+};
+
+// Timeline API
+export const timelineApi = {
+  get: (from?: string, limit?: number) => api.get('/timeline', { params: { from, limit } }),
+};
+
+// Dashboard API
+export const dashboardApi = {
+  get: () => api.get('/dashboard'),
+  rebuild: () => api.post('/dashboard/rebuild'),
+};
+
+// Search API
+export const searchApi = {
+  fuzzy: (q: string, limit = 20) => api.get('/search/fuzzy', { params: { q, limit } }),
+  suggest: (prefix: string, limit = 10) => api.get('/search/suggest', { params: { prefix, limit } }),
+  duplicates: (kind?: 'task' | 'note') => api.get('/duplicates', { params: { kind } }),
+};
+
+// Attachments API
+export const attachmentsApi = {
+  upload: (parent: 'notes' | 'tasks', id: number, file: File) =>
+    api.post(`/${parent}/${id}/attachments`, file, {
+      params: { filename: file.name },
+      headers: { 'Content-Type': file.type || 'application/octet-stream' },
+    }),
+  list: (parent: 'notes' | 'tasks', id: number) => api.get(`/${parent}/${id}/attachments`),
+  remove: (parent: 'notes' | 'tasks', id: number, hash: string) => api.delete(`/${parent}/${id}/attachments/${hash}`),
+  url: (hash: string) => `${api.defaults.baseURL}/attachments/${hash}`,
+};
+
 // Weather API
 export const weatherApi = {
   getWeather: (city: string) => api.get(`/weather/${city}`),
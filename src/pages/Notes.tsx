@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Plus, RefreshCw, Trash2, Edit, X } from 'lucide-react';
-import { notesApi } from '@/lib/api';
+import { ChangeEvent, notesApi } from '@/lib/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
@@ -26,6 +27,23 @@ export default function Notes() {
     fetchNotes();
   }, []);
 
+  const isFeedLive = useChangeFeed(
+    'note',
+    (event: ChangeEvent) => {
+      if (event.op === 'clear') {
+        setNotes([]);
+      } else if (event.op === 'delete') {
+        setNotes((prev) => prev.filter((n) => n.id !== event.id));
+      } else if (event.row) {
+        const note: Note = { id: event.row.id, content: event.row.content };
+        setNotes((prev) =>
+          prev.some((n) => n.id === note.id) ? prev.map((n) => (n.id === note.id ? note : n)) : [...prev, note],
+        );
+      }
+    },
+    () => fetchNotes(),
+  );
+
   const fetchNotes = async () => {
     setLoading(true);
     try {
@@ -75,7 +93,7 @@ export default function Notes() {
         await notesApi.create({ content });
         toast.success('Note added successfully!');
       }
-      fetchNotes();
+      if (!isFeedLive()) fetchNotes();
       handleCloseModal();
     } catch (error) {
       toast.error(editingNote ? 'Failed to update note' : 'Failed to add note');
@@ -86,7 +104,7 @@ export default function Notes() {
     try {
       await notesApi.delete(id);
       toast.success('Note deleted!');
-      fetchNotes();
+      if (!isFeedLive()) fetchNotes();
     } catch (error) {
       toast.error('Failed to delete note');
     }
@@ -96,7 +114,7 @@ export default function Notes() {
     try {
       await notesApi.clearAll();
       toast.success('All notes cleared!');
-      fetchNotes();
+      if (!isFeedLive()) fetchNotes();
     } catch (error) {
       toast.error('Failed to clear notes');
     }
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Plus, RefreshCw, Trash2, Edit, X, Star } from 'lucide-react';
-import { remindersApi } from '@/lib/api';
+import { ChangeEvent, remindersApi } from '@/lib/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -13,8 +14,13 @@ interface Reminder {
   id: number;
   content: string;
   date: string;
+  remind_at: number | null;
 }
 
+// date strings mix all-day and offset-aware forms, so order by the epoch instead; undated rows go last.
+const byRemindAt = (a: Reminder, b: Reminder) =>
+  (a.remind_at ?? Number.MAX_SAFE_INTEGER) - (b.remind_at ?? Number.MAX_SAFE_INTEGER);
+
 interface TodayReminder {
   id: number;
   content: string;
@@ -34,6 +40,32 @@ export default function Reminders() {
     fetchReminders();
   }, []);
 
+  const isFeedLive = useChangeFeed(
+    'reminder',
+    (event: ChangeEvent) => {
+      if (event.op === 'clear') {
+        setReminders([]);
+        setTodayReminders([]);
+        return;
+      }
+      const without = <T extends { id: number }>(list: T[]) => list.filter((r) => r.id !== event.id);
+      if (event.op === 'delete' || !event.row) {
+        setReminders(without);
+        setTodayReminders(without);
+        return;
+      }
+      const row = event.row;
+      const reminder: Reminder = { id: row.id, content: row.content, date: row.date, remind_at: row.remind_at };
+      setReminders((prev) => [...without(prev), reminder].sort(byRemindAt));
+      // remind_at counts wall-clock seconds as if in UTC, so its UTC date is the reminder's own date.
+      const isToday =
+        row.remind_at != null &&
+        new Date(row.remind_at * 1000).toISOString().slice(0, 10) === new Date().toLocaleDateString('en-CA');
+      setTodayReminders((prev) => (isToday ? [...without(prev), { id: row.id, content: row.content }] : without(prev)));
+    },
+    () => fetchReminders(),
+  );
+
   const fetchReminders = async () => {
     setLoading(true);
     try {
@@ -55,6 +87,7 @@ export default function Reminders() {
           id: r[0],
           content: r[1],
           date: r[2],
+          remind_at: r[3],
         }));
       }
   
@@ -70,7 +103,7 @@ export default function Reminders() {
         }));
       }
   
-      setReminders(allReminders.sort((a, b) => a.date.localeCompare(b.date)));
+      setReminders(allReminders.sort(byRemindAt));
       setTodayReminders(todayRem);
     } catch (error: any) {
       const msgAll = error?.response?.data?.message;
@@ -101,7 +134,7 @@ export default function Reminders() {
         await remindersApi.create(formData);
         toast.success('Reminder added successfully!');
       }
-      fetchReminders();
+      if (!isFeedLive()) fetchReminders();
       handleCloseModal();
     } catch (error) {
       toast.error(editingReminder ? 'Failed to update reminder' : 'Failed to add reminder');
@@ -112,7 +145,7 @@ export default function Reminders() {
     try {
       await remindersApi.delete(id);
       toast.success('Reminder deleted!');
-      fetchReminders();
+      if (!isFeedLive()) fetchReminders();
     } catch (error) {
       toast.error('Failed to delete reminder');
     }
@@ -122,7 +155,7 @@ export default function Reminders() {
     try {
       await remindersApi.clearAll();
       toast.success('All reminders cleared!');
-      fetchReminders();
+      if (!isFeedLive()) fetchReminders();
     } catch (error) {
       toast.error('Failed to clear reminders');
     }
@@ -4,6 +4,7 @@ import { motion, AnimatePresence } from "framer-motion";
 import { Mic, Send, X, Bot } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
+import { socketApi, toSocketOperation } from "@/lib/api";
 
 // Extend window with SpeechRecognition for TypeScript
 declare global {
@@ -172,6 +173,18 @@ export default function Sara() {
   };
 
   const apiCall = async (url: string, options: RequestInit = {}) => {
+    // Known task/note/reminder/weather calls share one WebSocket; anything else, or a socket
+    // that cannot be opened, goes over plain HTTP. Once a request has been sent the server may
+    // already have applied it, so a later failure is reported rather than retried.
+    const body = typeof options.body === "string" ? JSON.parse(options.body) : undefined;
+    const operation = toSocketOperation(options.method || "GET", url, body);
+    if (operation) {
+      try {
+        return await socketApi.request(operation.op, operation.params);
+      } catch (error: any) {
+        if (!error?.unavailable) throw error;
+      }
+    }
     try {
       const response = await fetch(`${API_BASE}${url}`, {
         ...options,
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Plus, RefreshCw, Trash2, Edit, X } from 'lucide-react';
-import { tasksApi } from '@/lib/api';
+import { ChangeEvent, tasksApi } from '@/lib/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -47,6 +48,33 @@ export default function Tasks() {
   useEffect(() => {
     fetchTasks();
   }, [sortBy]);
+
+  const compareTasks = (a: Task, b: Task) =>
+    sortBy === 'date'
+      ? a.due_date.localeCompare(b.due_date) // earliest date first
+      : a.priority - b.priority; // higher priority (1 highest) first
+
+  const isFeedLive = useChangeFeed(
+    'task',
+    (event: ChangeEvent) => {
+      if (event.op === 'clear') {
+        setTasks([]);
+      } else if (event.op === 'delete') {
+        setTasks((prev) => prev.filter((t) => t.id !== event.id));
+      } else if (event.row) {
+        const row = event.row;
+        const task: Task = {
+          id: row.id,
+          title: row.title,
+          description: row.description,
+          due_date: row.due_date,
+          priority: row.priority,
+        };
+        setTasks((prev) => [...prev.filter((t) => t.id !== task.id), task].sort(compareTasks));
+      }
+    },
+    () => fetchTasks(),
+  );
   
 
   const fetchTasks = async () => {
@@ -73,15 +101,7 @@ export default function Tasks() {
         priority: task[4],
       }));
   
-      tasksData.sort((a, b) => {
-        if (sortBy === 'date') {
-          // earliest date first
-          return a.due_date.localeCompare(b.due_date);
-        } else {
-          // higher priority (1 highest) first
-          return a.priority - b.priority;
-        }
-      });
+      tasksData.sort(compareTasks);
   
       setTasks(tasksData);
     } catch (error: any) {
@@ -116,7 +136,7 @@ export default function Tasks() {
         await tasksApi.create(formData);
         toast.success('Task added successfully!');
       }
-      fetchTasks();
+      if (!isFeedLive()) fetchTasks();
       handleCloseModal();
     } catch (error) {
       toast.error(editingTask ? 'Failed to update task' : 'Failed to add task');
@@ -127,7 +147,7 @@ export default function Tasks() {
     try {
       await tasksApi.delete(id);
       toast.success('Task deleted!');
-      fetchTasks();
+      if (!isFeedLive()) fetchTasks();
     } catch (error) {
       toast.error('Failed to delete task');
     }
@@ -137,7 +157,7 @@ export default function Tasks() {
     try {
       await tasksApi.clearAll();
       toast.success('All tasks cleared!');
-      fetchTasks();
+      if (!isFeedLive()) fetchTasks();
     } catch (error) {
       toast.error('Failed to clear tasks');
     }
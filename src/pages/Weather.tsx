@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Cloud, RefreshCw, Trash2, Search, X } from 'lucide-react';
-import { weatherApi } from '@/lib/api';
+import { ChangeEvent, weatherApi } from '@/lib/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -25,6 +26,20 @@ export default function Weather() {
     fetchHistory();
   }, []);
 
+  // New checks and resets arrive over the change feed; history is newest first.
+  const isFeedLive = useChangeFeed(
+    'weather',
+    (event: ChangeEvent) => {
+      if (event.op === 'clear') {
+        setHistory([]);
+      } else if (event.op === 'create' && event.row) {
+        const entry = event.row as WeatherHistory;
+        setHistory((prev) => [entry, ...prev.filter((h) => h.id !== entry.id)]);
+      }
+    },
+    () => fetchHistory(),
+  );
+
   const fetchHistory = async () => {
     try {
       const response = await weatherApi.getHistory();
@@ -56,7 +71,7 @@ export default function Weather() {
       const response = await weatherApi.getWeather(city);
       setCurrentWeather(response.data.weather);
       toast.success('Weather fetched successfully!');
-      fetchHistory(); // Refresh history
+      if (!isFeedLive()) fetchHistory();
     } catch (error) {
       toast.error('Failed to fetch weather');
     } finally {
@@ -0,0 +1,120 @@
+import bisect
+import re
+import sys
+import threading
+
+WORD_RE = re.compile(r"\w+")
+
+class SuggestIndex:
+    """In-memory typeahead over task titles, note first lines and reminder content.
+
+    Each distinct lower-cased word is stored once, in a sorted vocabulary, with an ordered posting
+    set of the labels that contain it; labels themselves are kept once per item. A lookup bisects
+    to the first word of the prefix and walks forward while words still match, so "dent" finds
+    "Call the dentist". A prefix spanning several words ("call the d") is checked against the
+    label of each candidate of its first word.
+    """
+
+    def __init__(self, max_label=120):
+        self.lock = threading.Lock()
+        self.words = []
+        self.postings = {}
+        self.items = {}
+        self.max_label = max_label
+
+    @staticmethod
+    def label_of(entity, row):
+        if entity == "task":
+            return row.get("title") or ""
+        if entity == "note":
+            lines = (row.get("content") or "").strip().splitlines()
+            return lines[0] if lines else ""
+        return row.get("content") or ""
+
+    @staticmethod
+    def _words(label):
+        return {sys.intern(w) for w in WORD_RE.findall(label.lower())}
+
+    def _add(self, ref, label, sort=True):
+        self.items[ref] = label
+        for word in self._words(label):
+            refs = self.postings.get(word)
+            if refs is None:
+                refs = self.postings[word] = {}
+                if sort:
+                    bisect.insort(self.words, word)
+            refs[ref] = None
+
+    def _remove(self, ref):
+        label = self.items.pop(ref, None)
+        if label is None:
+            return
+        for word in self._words(label):
+            refs = self.postings[word]
+            del refs[ref]
+            if not refs:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+
+    def put(self, entity, entity_id, label):
+        label = label.strip()[: self.max_label]
+        with self.lock:
+            self._remove((entity, entity_id))
+            if label:
+                self._add((entity, entity_id), label)
+
+    def remove(self, entity, entity_id):
+        with self.lock:
+            self._remove((entity, entity_id))
+
+    def clear(self, entity):
+        with self.lock:
+            for ref in [r for r in self.items if r[0] == entity]:
+                self._remove(ref)
+
+    def load(self, entity, rows):
+        """Bulk (re)build one entity from (id, label) pairs; sorts the vocabulary once instead of inserting one by one."""
+        with self.lock:
+            for ref in [r for r in self.items if r[0] == entity]:
+                self._remove(ref)
+            for entity_id, label in rows:
+                label = (label or "").strip()[: self.max_label]
+                if label:
+                    self._add((entity, entity_id), label, sort=False)
+            self.words = sorted(self.postings)
+
+    def handle(self, event):
+        entity = event["entity"]
+        if entity not in ("task", "note", "reminder"):
+            return
+        if event["op"] in ("create", "update") and event["row"]:
+            self.put(entity, event["id"], self.label_of(entity, event["row"]))
+        elif event["op"] == "delete":
+            self.remove(entity, event["id"])
+        elif event["op"] == "clear":
+            self.clear(entity)
+
+    def suggest(self, prefix, limit=10):
+        prefix = prefix.strip().lower()
+        head = WORD_RE.match(prefix)
+        if not head:
+            return []
+        head = head.group()
+        # Past its first word the prefix must match the label text from that word start on.
+        tail = re.compile(r"(?<!\w)" + re.escape(prefix)) if len(head) < len(prefix) else None
+        results = []
+        with self.lock:
+            i = bisect.bisect_left(self.words, head)
+            while i < len(self.words) and len(results) < limit:
+                word = self.words[i]
+                if not word.startswith(head) or (tail and word != head):
+                    break
+                for ref in self.postings[word]:
+                    label = self.items[ref]
+                    if tail and not tail.search(label.lower()):
+                        continue
+                    results.append({"type": ref[0], "id": ref[1], "label": label})
+                    if len(results) == limit:
+                        break
+                i += 1
+        return results
@@ -0,0 +1,99 @@
+import json
+import time
+from db import DBHelper
+from notes import make_preview
+
+CHANGE_FIELDS = ("seq", "entity", "op", "id", "row")
+
+class ChangeLog:
+    """Append-only log of every change published on the bus, for clients catching up with GET /sync.
+
+    Entries are written from inside the mutation's transaction, so the log and the tables never
+    disagree. Deletes and clears stay in the log as tombstones. compact() keeps only the latest
+    entry per row, and drops tombstones older than tombstone_days. A client whose cursor is older
+    than the newest dropped tombstone (the watermark) must reset with a full download.
+    """
+
+    def __init__(self, db: DBHelper, tombstone_days=30, preview_chars=200):
+        self.db = db
+        self.tombstone_days = tombstone_days
+        self.preview_chars = preview_chars
+
+    def compact_row(self, entity, row):
+        # Note bodies can be large (and are stored compressed); the log carries a preview and
+        # the version, and clients fetch GET /notes/{id} when they need the full text.
+        if entity == "note":
+            return {"id": row["id"], "version": row["version"], "preview": make_preview(row["content"] or "", self.preview_chars)}
+        return row
+
+    def handle(self, event):
+        row = event["row"]
+        if row is not None:
+            row = json.dumps(self.compact_row(event["entity"], row), separators=(",", ":"), default=str)
+        self.db.execute(
+            "INSERT INTO changes (entity, op, entity_id, row, created_at) VALUES (?, ?, ?, ?, ?)",
+            (event["entity"], event["op"], event["id"], row, int(time.time())),
+        )
+
+    def is_empty(self):
+        c = self.db.execute("SELECT 1 FROM changes LIMIT 1")
+        return not (c and c.fetchone())
+
+    def seed(self, rows):
+        """Log (entity, id, row) snapshots of data that predates the log as creates."""
+        with self.db.transaction():
+            for entity, entity_id, row in rows:
+                self.handle({"entity": entity, "op": "create", "id": entity_id, "row": row})
+
+    def latest_seq(self):
+        # Highest seq ever handed out, even if compaction has since removed that entry.
+        c = self.db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'")
+        row = c.fetchone() if c else None
+        return (row[0] or 0) if row else 0
+
+    def watermark(self):
+        c = self.db.execute("SELECT value FROM sync_state WHERE name = 'watermark'")
+        row = c.fetchone() if c else None
+        return row[0] if row else 0
+
+    def changes_since(self, since, limit=500):
+        """(changes, has_more) after seq `since`, oldest first; None if the client must reset, because
+        `since` is behind the watermark or ahead of anything this log has issued (e.g. a restored database)."""
+        if since < self.watermark() or since > self.latest_seq():
+            return None
+        c = self.db.execute(
+            "SELECT seq, entity, op, entity_id, row FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (since, limit + 1)
+        )
+        rows = c.fetchall() if c else []
+        changes = [
+            dict(zip(CHANGE_FIELDS, (seq, entity, op, entity_id, json.loads(row) if row else None)))
+            for seq, entity, op, entity_id, row in rows[:limit]
+        ]
+        return changes, len(rows) > limit
+
+    def compact(self):
+        """Drop superseded entries and expired tombstones. Returns the number of entries removed."""
+        cutoff = int(time.time()) - self.tombstone_days * 86400
+        with self.db.transaction():
+            removed = self.db.execute(
+                "DELETE FROM changes WHERE entity_id IS NOT NULL AND seq < "
+                "(SELECT MAX(seq) FROM changes c WHERE c.entity = changes.entity AND c.entity_id = changes.entity_id)"
+            ).rowcount
+            # Everything before an entity's latest clear is superseded by it.
+            c = self.db.execute("SELECT entity, MAX(seq) FROM changes WHERE op = 'clear' GROUP BY entity")
+            for entity, seq in c.fetchall():
+                removed += self.db.execute("DELETE FROM changes WHERE entity = ? AND seq < ?", (entity, seq)).rowcount
+            c = self.db.execute(
+                "SELECT MAX(seq) FROM changes WHERE op IN ('delete', 'clear') AND created_at < ?", (cutoff,)
+            )
+            expired = c.fetchone()[0]
+            if expired is not None:
+                removed += self.db.execute(
+                    "DELETE FROM changes WHERE op IN ('delete', 'clear') AND seq <= ?", (expired,)
+                ).rowcount
+                self.db.execute(
+                    "INSERT INTO sync_state (name, value) VALUES ('watermark', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (expired,),
+                )
+        return removed
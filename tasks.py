@@ -1,24 +1,305 @@
 from db import DBHelper
+from utils import to_epoch
+import heapq
 import logging
+import threading
+import time
+
+TASK_COLUMNS = "id, title, description, due_date, priority, due_at, status, completed_at, version"
+TASK_FIELDS = tuple(TASK_COLUMNS.split(", "))
+TASK_STATUSES = ("open", "done")
+
+def normalize_tags(tags):
+    return sorted({t.strip().lower() for t in tags if t and t.strip()})
+
+def tag_filter(tags, match="all"):
+    """SQL fragment selecting task ids carrying all (INTERSECT) or any (UNION) of the tags.
+
+    Every branch is a range scan of one tag's slice of the task_tags primary key,
+    which is that tag's posting list of task ids in sorted order.
+    """
+    tags = normalize_tags(tags)
+    if not tags:
+        return None, ()
+    op = " INTERSECT " if match == "all" else " UNION "
+    return "id IN (" + op.join(["SELECT task_id FROM task_tags WHERE tag = ?"] * len(tags)) + ")", tuple(tags)
+
+class NextActionsQueue:
+    """In-memory min-heap of (priority, due_at, id) kept in step with TaskManager writes.
+
+    Edits and deletes are applied lazily: superseded heap entries are skipped when popped,
+    and the heap is rebuilt once stale entries outnumber live ones.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heap = []
+        self.keys = {}
+
+    @staticmethod
+    def key(task_id, priority, due_at):
+        # Mirrors ORDER BY priority, due_at, id (SQLite sorts NULL first).
+        return (priority if priority is not None else -1, due_at is not None, due_at or 0, task_id)
+
+    def load(self, rows):
+        with self.lock:
+            self.keys = {r[0]: self.key(*r) for r in rows}
+            self.heap = list(self.keys.values())
+            heapq.heapify(self.heap)
+
+    def _compact(self):
+        # Caller holds the lock.
+        if len(self.heap) > 2 * len(self.keys) + 64:
+            self.heap = list(self.keys.values())
+            heapq.heapify(self.heap)
+
+    def put(self, task_id, priority, due_at):
+        with self.lock:
+            k = self.key(task_id, priority, due_at)
+            if self.keys.get(task_id) == k:
+                return
+            self.keys[task_id] = k
+            heapq.heappush(self.heap, k)
+            self._compact()
+
+    def remove(self, task_id):
+        with self.lock:
+            self.keys.pop(task_id, None)
+            self._compact()
+
+    def clear(self):
+        with self.lock:
+            self.heap, self.keys = [], {}
+
+    def top(self, k):
+        with self.lock:
+            found = []
+            while self.heap and len(found) < k:
+                entry = heapq.heappop(self.heap)
+                if self.keys.get(entry[-1]) == entry and (not found or found[-1] != entry):
+                    found.append(entry)
+            for entry in found:
+                heapq.heappush(self.heap, entry)
+            return [entry[-1] for entry in found]
 
 class TaskManager:
-    def __init__(self, db: DBHelper):
+    def __init__(self, db: DBHelper, next_cache=False, bus=None):
         self.db = db
+        self.bus = bus
+        self.next_queue = None
+        if next_cache:
+            self.next_queue = NextActionsQueue()
+            c = self.db.execute("SELECT id, priority, due_at FROM tasks WHERE status = 'open'")
+            self.next_queue.load(c.fetchall() if c else [])
+
+    def _requeue(self, task_id):
+        # Queue changes are applied after commit, so a rolled-back write never reaches the heap.
+        c = self.db.execute("SELECT priority, due_at, status FROM tasks WHERE id=?", (task_id,))
+        row = c.fetchone() if c else None
+        if row is None or row[2] != "open":
+            self.next_queue.remove(task_id)
+        else:
+            self.next_queue.put(task_id, row[0], row[1])
+
+    def _publish(self, op, task_id=None):
+        if self.bus:
+            row = self.get_task(task_id) if op in ("create", "update") else None
+            self.bus.publish("task", op, task_id, row)
+
+    def add_task(self, title, description, due_date, priority, tags=None):
+        query = "INSERT INTO tasks (title, description, due_date, priority, due_at) VALUES (?, ?, ?, ?, ?)"
+        due_at = to_epoch(due_date)
+        with self.db.transaction():
+            task_id = self.db.execute(query, (title, description, due_date, priority, due_at)).lastrowid
+            if tags:
+                self._insert_tags(task_id, tags)
+            self._publish("create", task_id)
+            if self.next_queue:
+                self.db.after_commit(lambda: self.next_queue.put(task_id, priority, due_at))
+        return task_id
+
+    def get_task(self, task_id):
+        """A single task as a dict, tags included, or None."""
+        c = self.db.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id=?", (task_id,))
+        row = c.fetchone() if c else None
+        if row is None:
+            return None
+        return {**dict(zip(TASK_FIELDS, row)), "tags": self.get_task_tags(task_id)}
 
-    def add_task(self, title, description, due_date, priority):
-        query = "INSERT INTO tasks (title, description, due_date, priority) VALUES (?, ?, ?, ?)"
-        self.db.execute(query, (title, description, due_date, priority), commit=True)
+    def get_tasks(self, status=None, tags=None, match="all"):
+        clauses, params = [], []
+        if status:
+            clauses.append("status=?")
+            params.append(status)
+        tag_sql, tag_params = tag_filter(tags or [], match)
+        if tag_sql:
+            clauses.append(tag_sql)
+            params.extend(tag_params)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        c = self.db.execute(f"SELECT {TASK_COLUMNS} FROM tasks{where}", tuple(params))
+        return c.fetchall() if c else []
+
+    def get_tasks_by_ids(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        c = self.db.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id IN ({','.join('?' * len(task_ids))})", tuple(task_ids))
+        return c.fetchall() if c else []
+
+    def get_tasks_due_between(self, start=None, end=None, tags=None, match="all", status=None):
+        # Half-open [start, end) epoch range, either bound optional; served by idx_tasks_due_at.
+        clauses, params = [], []
+        if status:
+            clauses.append("status=?")
+            params.append(status)
+        tag_sql, tag_params = tag_filter(tags or [], match)
+        if tag_sql:
+            clauses.append(tag_sql)
+            params.extend(tag_params)
+        if start is not None:
+            clauses.append("due_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("due_at < ?")
+            params.append(end)
+        clauses.append("due_at IS NOT NULL")
+        c = self.db.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE {' AND '.join(clauses)} ORDER BY due_at", tuple(params))
+        return c.fetchall() if c else []
+
+    def get_next_tasks(self, k):
+        # Open tasks only, highest priority (1) first, then earliest due; a bounded walk of idx_tasks_next.
+        if self.next_queue is None:
+            c = self.db.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE status = 'open' ORDER BY priority, due_at, id LIMIT ?", (k,)
+            )
+            return c.fetchall() if c else []
+        ids = self.next_queue.top(k)
+        rows = {r[0]: r for r in self.get_tasks_by_ids(ids)}
+        return [rows[i] for i in ids if i in rows]
+
+    def edit_task(self, task_id, title, description, due_date, priority, tags=None, expected_version=None):
+        """Full rewrite of a task. Returns the new version, or None if the task does not exist.
+
+        With expected_version the write only applies if nobody else has changed the task since;
+        otherwise VersionConflictError is raised.
+        """
+        query = "UPDATE tasks SET title=?, description=?, due_date=?, priority=?, due_at=?, version = version + 1 WHERE id=?"
+        due_at = to_epoch(due_date)
+        params = (title, description, due_date, priority, due_at, task_id)
+        if expected_version is not None:
+            query += " AND version=?"
+            params += (expected_version,)
+        with self.db.transaction():
+            c = self.db.execute(query, params)
+            if not c.rowcount:
+                self.db.check_version("tasks", task_id, expected_version)
+                return None
+            if tags is not None:
+                self.set_tags(task_id, tags)
+            version = self.db.get_version("tasks", task_id)
+            self._publish("update", task_id)
+            if self.next_queue:
+                self.db.after_commit(lambda: self._requeue(task_id))
+        return version
+
+    def get_task_tags(self, task_id):
+        c = self.db.execute("SELECT tag FROM task_tags WHERE task_id=? ORDER BY tag", (task_id,))
+        return [r[0] for r in c.fetchall()] if c else []
 
-    def get_tasks(self):
-        c = self.db.execute("SELECT id, title, description, due_date, priority FROM tasks")
+    def get_all_tags(self):
+        # Only live tasks count; archived tasks keep their tags but are not listed by tag filters.
+        c = self.db.execute(
+            "SELECT tag, COUNT(*) FROM task_tags WHERE task_id IN (SELECT id FROM tasks) GROUP BY tag ORDER BY tag"
+        )
         return c.fetchall() if c else []
 
-    def edit_task(self, task_id, title, description, due_date, priority):
-        query = "UPDATE tasks SET title=?, description=?, due_date=?, priority=? WHERE id=?"
-        self.db.execute(query, (title, description, due_date, priority, task_id), commit=True)
+    def _insert_tags(self, task_id, tags):
+        added = 0
+        for tag in normalize_tags(tags):
+            added += self.db.execute("INSERT OR IGNORE INTO task_tags (tag, task_id) VALUES (?, ?)", (tag, task_id)).rowcount
+        return added
+
+    def _tags_changed(self, task_id):
+        self.db.execute("UPDATE tasks SET version = version + 1 WHERE id=?", (task_id,))
+        self._publish("update", task_id)
+
+    def add_tags(self, task_id, tags):
+        with self.db.transaction():
+            if self.db.get_version("tasks", task_id) is not None and self._insert_tags(task_id, tags):
+                self._tags_changed(task_id)
+
+    def set_tags(self, task_id, tags):
+        # Part of a larger task write; the caller bumps the version and publishes.
+        with self.db.transaction():
+            self.db.execute("DELETE FROM task_tags WHERE task_id=?", (task_id,))
+            self._insert_tags(task_id, tags)
+
+    def remove_tag(self, task_id, tag):
+        with self.db.transaction():
+            c = self.db.execute("DELETE FROM task_tags WHERE tag=? AND task_id=?", (tag.strip().lower(), task_id))
+            if c.rowcount:
+                self._tags_changed(task_id)
+
+    def patch_task(self, task_id, fields, expected_version=None):
+        """Write only the supplied columns.
+
+        Returns None if the task is missing, else (changed, version). Raises VersionConflictError
+        if expected_version is given and the task has moved on.
+        """
+        fields = dict(fields)
+        tags = fields.pop("tags", None)
+        if "due_date" in fields:
+            fields["due_at"] = to_epoch(fields["due_date"])
+        with self.db.transaction():
+            if self.db.check_version("tasks", task_id, expected_version) is None:
+                return None
+            changed = bool(self.db.update_changed("tasks", task_id, fields, expected_version))
+            if tags is not None and normalize_tags(tags) != self.get_task_tags(task_id):
+                self.set_tags(task_id, tags)
+                if not changed:
+                    self.db.execute("UPDATE tasks SET version = version + 1 WHERE id=?", (task_id,))
+                changed = True
+            if changed:
+                self._publish("update", task_id)
+            version = self.db.get_version("tasks", task_id)
+            if changed and self.next_queue and ("priority" in fields or "due_at" in fields):
+                self.db.after_commit(lambda: self._requeue(task_id))
+        return changed, version
+
+    def set_status(self, task_id, status):
+        """Mark a task done (stamping completed_at) or reopen it. Returns False if the task does not exist."""
+        if status not in TASK_STATUSES:
+            raise ValueError(f"Unknown task status: {status!r}")
+        completed_at = int(time.time()) if status == "done" else None
+        with self.db.transaction():
+            c = self.db.execute(
+                "UPDATE tasks SET status=?, completed_at=?, version = version + 1 WHERE id=?",
+                (status, completed_at, task_id),
+            )
+            if not c.rowcount:
+                return False
+            self._publish("update", task_id)
+            if self.next_queue:
+                self.db.after_commit(lambda: self._requeue(task_id))
+        return True
+
+    def get_archived_tasks(self, limit=50, offset=0):
+        c = self.db.execute(
+            f"SELECT {TASK_COLUMNS}, archived_at FROM tasks_archive ORDER BY completed_at DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return c.fetchall() if c else []
 
     def delete_task(self, task_id):
-        self.db.execute("DELETE FROM tasks WHERE id=?", (task_id,), commit=True)
+        with self.db.transaction():
+            if self.db.execute("DELETE FROM tasks WHERE id=?", (task_id,)).rowcount:
+                self._publish("delete", task_id)
+                if self.next_queue:
+                    self.db.after_commit(lambda: self.next_queue.remove(task_id))
 
     def delete_all_tasks(self):
-        self.db.execute("DELETE FROM tasks", commit=True)
\ No newline at end of file
+        with self.db.transaction():
+            self.db.execute("DELETE FROM tasks")
+            self._publish("clear")
+            if self.next_queue:
+                self.db.after_commit(self.next_queue.clear)
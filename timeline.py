@@ -0,0 +1,40 @@
+import heapq
+import itertools
+from db import DBHelper
+
+class TimelineManager:
+    # Each source is read in index order (due_at / remind_at / checked_at) and capped at the page size,
+    # so a page never touches more than `limit` rows per table.
+    SOURCES = {
+        "task": "SELECT due_at, id, title, description, due_date, priority FROM tasks WHERE due_at >= ? AND status = 'open' ORDER BY due_at, id LIMIT ?",
+        "reminder": "SELECT remind_at, id, content, date FROM reminders WHERE remind_at >= ? ORDER BY remind_at, id LIMIT ?",
+        "weather": "SELECT checked_at, id, city, weather FROM weather_history WHERE checked_at >= ? ORDER BY checked_at, id LIMIT ?",
+    }
+    FIELDS = {
+        "task": ("id", "title", "description", "due_date", "priority"),
+        "reminder": ("id", "content", "date"),
+        "weather": ("id", "city", "weather"),
+    }
+
+    def __init__(self, db: DBHelper):
+        self.db = db
+
+    def _stream(self, kind, start, limit):
+        c = self.db.execute(self.SOURCES[kind], (start, limit))
+        if c is None:
+            return
+        try:
+            for row in c:
+                yield row[0], kind, row[1:]
+        finally:
+            c.close()
+
+    def get_timeline(self, start, limit):
+        streams = [self._stream(kind, start, limit) for kind in self.SOURCES]
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        try:
+            page = list(itertools.islice(merged, limit))
+        finally:
+            for s in streams:
+                s.close()
+        return [{"type": kind, "at": at, **dict(zip(self.FIELDS[kind], row))} for at, kind, row in page]
@@ -1,3 +1,5 @@
+import calendar
+import datetime
 import json
 import yaml
 import logging
@@ -12,4 +14,59 @@ def setup_logging(debug=False):
 
 def export_to_json(data, filepath):
     with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+        json.dump(data, f, indent=2)
+
+# Day-first numeric formats are accepted alongside ISO because that is how our users type dates.
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+
+def _parse(value):
+    """Return (datetime, has_time) for a user supplied date or ISO date-time string."""
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt), False
+        except ValueError:
+            pass
+    try:
+        return datetime.datetime.fromisoformat(text), True
+    except ValueError:
+        raise ValueError(f"Unrecognised date: {value!r}")
+
+def normalize_date(value):
+    """Normalize a date to YYYY-MM-DD, dropping any time component."""
+    return _parse(value)[0].date().isoformat()
+
+def normalize_datetime(value):
+    """Normalize to YYYY-MM-DD for all-day values, else to an ISO date-time with UTC offset.
+
+    Naive times are taken to be in the server's local timezone.
+    """
+    dt, has_time = _parse(value)
+    if not has_time:
+        return dt.date().isoformat()
+    return dt.astimezone().isoformat(timespec="minutes") if dt.tzinfo is None else dt.isoformat(timespec="minutes")
+
+def wall_clock_epoch(dt):
+    """Seconds since 1970-01-01 of dt's own wall-clock time, read as if it were UTC.
+
+    The result does not depend on the server's timezone: an all-day value maps to UTC midnight,
+    so day D always spans [D 00:00Z, D+1 00:00Z) no matter where the data was written.
+    """
+    return calendar.timegm(dt.replace(tzinfo=None).timetuple())
+
+def to_epoch(value):
+    """Wall-clock epoch seconds (see wall_clock_epoch) for a date or date-time string."""
+    dt, _ = _parse(value)
+    return wall_clock_epoch(dt)
+
+def epoch_range(start=None, end=None):
+    """Half-open [start, end) epoch bounds for an inclusive user supplied range.
+
+    A date-only end covers that whole day. Missing bounds stay None.
+    """
+    lo = to_epoch(start) if start else None
+    hi = None
+    if end:
+        dt, has_time = _parse(end)
+        hi = wall_clock_epoch(dt) + (1 if has_time else 86400)
+    return lo, hi
@@ -2,11 +2,16 @@ import requests
 import datetime
 import logging
 from db import DBHelper
+from utils import wall_clock_epoch
+
+
+WEATHER_FIELDS = ("id", "city", "date", "weather", "checked_at")
 
 
 class WeatherManager:
-    def __init__(self, db: DBHelper):
+    def __init__(self, db: DBHelper, bus=None):
         self.db = db
+        self.bus = bus
 
     def map_code(self, code: int) -> str:
         mapping = {
@@ -81,11 +86,14 @@ class WeatherManager:
                 f"wind {windspeed} km/h at {time_str} IST"
             )
 
-            self.db.execute(
-                "INSERT INTO weather_history (city, date, weather) VALUES (?, ?, ?)",
-                (city, date_str, weather_str),
-                commit=True,
-            )
+            row = (city, date_str, weather_str, wall_clock_epoch(now))
+            with self.db.transaction():
+                c = self.db.execute(
+                    "INSERT INTO weather_history (city, date, weather, checked_at) VALUES (?, ?, ?, ?)",
+                    row,
+                )
+                if self.bus:
+                    self.bus.publish("weather", "create", c.lastrowid, dict(zip(WEATHER_FIELDS, (c.lastrowid, *row))))
             return weather_str
 
         except requests.RequestException as e:
@@ -94,9 +102,12 @@ class WeatherManager:
 
     def get_weather_history(self):
         c = self.db.execute(
-            "SELECT id, city, date, weather FROM weather_history ORDER BY date DESC"
+            "SELECT id, city, date, weather, checked_at FROM weather_history ORDER BY checked_at DESC, id DESC"
         )
         return c.fetchall() if c else []
 
     def clear_weather_history(self):
-        self.db.execute("DELETE FROM weather_history", commit=True)
+        with self.db.transaction():
+            self.db.execute("DELETE FROM weather_history")
+            if self.bus:
+                self.bus.publish("weather", "clear")